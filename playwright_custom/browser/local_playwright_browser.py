@@ -117,10 +117,37 @@ class LocalPlaywrightBrowser(
                 env={} if self._headless else {"DISPLAY": ":0"},
             )
 
-            self._context = await self._browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36 Edg/122.0.0.0",
-                accept_downloads=self._enable_downloads,
+            self._context = await self._new_context()
+
+    async def _new_context(self) -> BrowserContext:
+        """
+        Create a fresh (non-persistent) context on the launched browser.
+        """
+        assert self._browser is not None
+        return await self._browser.new_context(
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36 Edg/122.0.0.0",
+            accept_downloads=self._enable_downloads,
+        )
+
+    async def recycle_context(self) -> BrowserContext:
+        """
+        Close the active browser context and replace it with a fresh one, dropping its
+        pages, cookies, storage and JS heap while keeping the browser process running.
+
+        Returns:
+            BrowserContext: The new browser context.
+
+        Raises:
+            RuntimeError: If the browser is not started or uses a persistent context.
+        """
+        if self._browser is None:
+            raise RuntimeError(
+                "Context recycling requires a started, non-persistent browser."
             )
+        if self._context:
+            await self._context.close()
+        self._context = await self._new_context()
+        return self._context
 
     async def _close(self) -> None:
         """
@@ -193,6 +193,9 @@ class PlaywrightController:
                 os.path.abspath(os.path.dirname(__file__)), "page_script.js"
             )
         )
+        if self.animate_actions:
+            # Install the animation helpers once per page
+            await self._animation.install(page)
 
     async def _ensure_page_ready(self, page: Page) -> None:
         """
@@ -653,10 +656,7 @@ class PlaywrightController:
         # Optionally animate the click
         if self.animate_actions:
             await self.add_cursor_box(page, identifier)
-            start_x, start_y = self.last_cursor_position
-            await self.gradual_cursor_animation(
-                page, start_x, start_y, center_x, center_y
-            )
+            await self.animate_action(page, "click", identifier, (center_x, center_y))
 
         new_page = await perform_click()
 
@@ -690,7 +690,7 @@ class PlaywrightController:
                     download_future.cancel()
 
         if self.animate_actions:
-            await self.remove_cursor_box(page, identifier)
+            await self.finish_action(page, "click", identifier)
 
         if self._sleep_after_action > 0:
             await page.wait_for_timeout(self._sleep_after_action * 1000)
@@ -722,25 +722,19 @@ class PlaywrightController:
         try:
             if self.animate_actions:
                 await self.add_cursor_box(page, identifier)
-                # Move cursor to the box slowly
-                start_x, start_y = self.last_cursor_position
+                # Move cursor to the box slowly while showing the hover effect
                 end_x, end_y = box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
-                await self.gradual_cursor_animation(
-                    page, start_x, start_y, end_x, end_y
-                )
+                await self.animate_action(page, "hover", identifier, (end_x, end_y))
                 await asyncio.sleep(0.1)
-                await page.mouse.move(
-                    box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
-                )
-
-                await self.remove_cursor_box(page, identifier)
+                await page.mouse.move(end_x, end_y)
+                await self.finish_action(page, "hover", identifier)
             else:
                 await page.mouse.move(
                     box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
                 )
         except Exception:
             if self.animate_actions:
-                await self.remove_cursor_box(page, identifier)
+                await self.finish_action(page, "hover", identifier)
             await target.hover()
 
     async def fill_id(
@@ -792,12 +786,9 @@ class PlaywrightController:
         try:
             if self.animate_actions:
                 await self.add_cursor_box(page, identifier)
-                # Move cursor to the box slowly
-                start_x, start_y = self.last_cursor_position
+                # Move cursor to the box slowly while showing the typing effect
                 end_x, end_y = box["x"] + box["width"] / 2, box["y"] + box["height"] / 2
-                await self.gradual_cursor_animation(
-                    page, start_x, start_y, end_x, end_y
-                )
+                await self.animate_action(page, "type", identifier, (end_x, end_y))
                 await asyncio.sleep(0.1)
 
             # Focus on the element
@@ -828,7 +819,7 @@ class PlaywrightController:
 
         finally:
             if self.animate_actions:
-                await self.remove_cursor_box(page, identifier)
+                await self.finish_action(page, "type", identifier)
 
     async def scroll_id(self, page: Page, identifier: str, direction: str) -> None:
         """
@@ -1417,16 +1408,19 @@ class PlaywrightController:
 
         return message_content, screenshot, metadata_hash
 
-    async def add_cursor_box(self, page: Page, identifier: str) -> None:
+    async def add_cursor_box(
+        self, page: Page, identifier: str, wait_for_highlight: float = 0.0
+    ) -> None:
         """
         Highlight the element with the given identifier and insert a custom cursor on the page.
         
         Args:
             page (Page): The Playwright page object.
             identifier (str): The element identifier.
+            wait_for_highlight (float): Optional pause in seconds to let the highlight transition play. Default: 0.0
         """
         await self._ensure_page_ready(page)
-        await self._animation.add_cursor_box(page, identifier)
+        await self._animation.add_cursor_box(page, identifier, wait_for_highlight)
         
     async def remove_cursor_box(self, page: Page, identifier: str) -> None:
         """
@@ -1448,6 +1442,8 @@ class PlaywrightController:
         end_y: float,
         steps: int = 20,
         step_delay: float = 0.05,
+        and_remove: bool = False,
+        identifier: Optional[str] = None,
     ) -> None:
         """
         Animate the cursor movement gradually from start to end coordinates.
@@ -1460,10 +1456,12 @@ class PlaywrightController:
             end_y (float): The ending y-coordinate.
             steps (int, optional): Number of steps for the animation. Default: 20
             step_delay (float, optional): Delay between steps in seconds. Default: 0.05
+            and_remove (bool, optional): Remove the cursor box once the movement ends. Default: False
+            identifier (str, optional): With `and_remove`, the highlighted element to clear. Default: None
         """
         await self._ensure_page_ready(page)
         await self._animation.gradual_cursor_animation(
-            page, start_x, start_y, end_x, end_y, steps, step_delay
+            page, start_x, start_y, end_x, end_y, steps, step_delay, and_remove, identifier
         )
         # Update our cursor position
         self.last_cursor_position = self._animation.last_cursor_position
@@ -1535,6 +1533,44 @@ class PlaywrightController:
         await self._ensure_page_ready(page)
         await self._animation.remove_action_effect(page, action_type)
 
+    async def animate_action(
+        self,
+        page: Page,
+        action_type: str,
+        element_id: Optional[str],
+        end: Tuple[float, float],
+    ) -> None:
+        """
+        Move the cursor from its last position to `end` while showing the action effect.
+        Both animations run concurrently.
+
+        Args:
+            page (Page): The Playwright page object.
+            action_type (str): Type of action ('click', 'hover', 'type', etc.)
+            element_id (Optional[str]): Element ID if action is on an element.
+            end (Tuple[float, float]): X,Y coordinates the cursor moves to.
+        """
+        await self._ensure_page_ready(page)
+        await self._animation.animate_action(
+            page, action_type, element_id, self.last_cursor_position, end
+        )
+        # Update our cursor position
+        self.last_cursor_position = self._animation.last_cursor_position
+
+    async def finish_action(
+        self, page: Page, action_type: str, identifier: Optional[str] = None
+    ) -> None:
+        """
+        Remove the action effect and the cursor box in a single round-trip.
+
+        Args:
+            page (Page): The Playwright page object.
+            action_type (str): Type of action to remove effect for ('click', 'hover', 'type', etc.)
+            identifier (Optional[str]): The highlighted element identifier, if any.
+        """
+        await self._ensure_page_ready(page)
+        await self._animation.finish_action(page, action_type, identifier)
+
     async def preview_action(self, page: Page, identifier: str) -> None:
         """
         Preview an action by animating the cursor movement and highlighting the element,
@@ -1,6 +1,442 @@
-from typing import Tuple, List, Dict, Any, Optional
-from playwright.async_api import Page
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Tuple, Dict, Any, Optional, Set
 import asyncio
+import logging
+import re
+import weakref
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+
+def _minify_js(source: str) -> str:
+    """
+    Strip indentation, blank lines and full-line `//` comments from a JS (or CSS) snippet.
+
+    Line breaks are kept so that automatic semicolon insertion still applies; this is only
+    meant to shrink what travels over the CDP websocket, not to be a real minifier.
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(
+        re.sub(r"\s+", " ", line) for line in lines if line and not line.startswith("//")
+    )
+
+
+# In-page helper bundle. Installed once per page (see `AnimationUtilsPlaywright.install`)
+# so that every animation call only ships a short expression over CDP instead of
+# re-sending and re-compiling the full JS source.
+HELPER_JS = _minify_js("""
+(() => {
+    if (window.__rpai) return;
+
+    const findElement = (id) => document.querySelector(`[__elementId='${id}']`);
+
+    const rpai = {
+        cursor: {
+            // Cached cursor element; set by create(), cleared by remove()
+            _el: null,
+            // Currently running glide() animation, polled from Python for completion
+            _anim: null,
+
+            create() {
+                let cursor = rpai.cursor._el;
+                if (cursor && cursor.isConnected) return cursor;
+                cursor = document.getElementById('red-cursor');
+                if (!cursor) {
+                    cursor = document.createElement('div');
+                    cursor.id = 'red-cursor';
+                    document.body.appendChild(cursor);
+                }
+                rpai.cursor._el = cursor;
+                return cursor;
+            },
+            glide(startX, startY, endX, endY, duration, remove, id) {
+                // Returns false when the Web Animations API is unavailable so that the
+                // caller can fall back to `play()`. With `remove`, the cursor box (and
+                // the highlight of `id`) is torn down as soon as the movement ends.
+                const cursor = rpai.cursor._el;
+                if (!cursor) {
+                    if (remove) rpai.quiet(() => rpai.finish(null, id));
+                    return null;
+                }
+                if (typeof cursor.animate !== 'function') return false;
+                const anim = cursor.animate(
+                    [
+                        { left: startX + 'px', top: startY + 'px' },
+                        { left: endX + 'px', top: endY + 'px' },
+                    ],
+                    { duration: duration, easing: 'linear', fill: 'forwards' }
+                );
+                if (remove) anim.onfinish = () => rpai.quiet(() => rpai.finish(null, id));
+                rpai.cursor._anim = anim;
+                return true;
+            },
+            play(xs, ys, delay, remove, id) {
+                // Step through precomputed positions on animation frames, at most one
+                // position every `delay` ms. Resolves once the last position is applied.
+                const cursor = rpai.cursor._el;
+                return new Promise((resolve) => {
+                    if (!cursor) return resolve();
+                    let i = 0;
+                    let last = -Infinity;
+                    const step = (now) => {
+                        if (i >= xs.length) {
+                            if (remove) rpai.quiet(() => rpai.finish(null, id));
+                            return resolve();
+                        }
+                        if (now - last >= delay) {
+                            cursor.style.left = xs[i] + 'px';
+                            cursor.style.top = ys[i] + 'px';
+                            i++;
+                            last = now;
+                        }
+                        requestAnimationFrame(step);
+                    };
+                    requestAnimationFrame(step);
+                });
+            },
+            move(x, y) {
+                const cursor = rpai.cursor._el;
+                if (!cursor) return;
+                cursor.style.left = x + 'px';
+                cursor.style.top = y + 'px';
+            },
+            remove() {
+                const cursor = rpai.cursor._el || document.getElementById('red-cursor');
+                if (cursor) cursor.remove();
+                rpai.cursor._el = null;
+                rpai.cursor._anim = null;
+            },
+        },
+
+        highlight(id) {
+            const elm = findElement(id);
+            if (elm) elm.classList.add('rpai-highlight');
+        },
+
+        unhighlight(id) {
+            const elm = findElement(id);
+            if (elm) elm.classList.remove('rpai-highlight');
+        },
+
+        center(id) {
+            const el = findElement(id);
+            if (!el) return null;
+            const rect = el.getBoundingClientRect();
+            return {
+                x: rect.left + rect.width / 2,
+                y: rect.top + rect.height / 2,
+                width: rect.width,
+                height: rect.height,
+            };
+        },
+
+        // --- box cache invalidation -------------------------------------
+        // Python caches the result of `track()`. Any layout-affecting change made by
+        // the page itself (DOM mutation, scroll, resize) notifies Python once through
+        // the exposed `__rpai_invalidate` binding until the next `track()` call.
+        _dirty: false,
+        _observer: null,
+
+        invalidate() {
+            if (rpai._dirty) return;
+            rpai._dirty = true;
+            if (window.__rpai_invalidate) window.__rpai_invalidate();
+        },
+
+        track(id) {
+            if (!rpai._observer) {
+                rpai._observer = new MutationObserver(() => rpai.invalidate());
+                rpai._observer.observe(document.documentElement, {
+                    childList: true,
+                    subtree: true,
+                    attributes: true,
+                    characterData: true,
+                });
+                window.addEventListener('scroll', () => rpai.invalidate(), { capture: true, passive: true });
+                window.addEventListener('resize', () => rpai.invalidate(), { passive: true });
+            }
+            const box = rpai.center(id);
+            rpai._dirty = false;
+            return box;
+        },
+
+        quiet(fn) {
+            // Run one of our own DOM mutations without invalidating the box cache
+            const result = fn();
+            if (rpai._observer) rpai._observer.takeRecords();
+            return result;
+        },
+
+        effects: {
+            click(x, y) {
+                // Ripple effect, removed after the animation completes
+                const ripple = document.createElement('div');
+                ripple.className = 'rpai-ripple';
+                ripple.style.left = (x - 20) + 'px';
+                ripple.style.top = (y - 20) + 'px';
+                document.body.appendChild(ripple);
+                setTimeout(() => ripple.remove(), 600);
+            },
+            hover(x, y) {
+                // Hover glow effect; reference kept to remove it later
+                const glow = document.createElement('div');
+                glow.className = 'rpai-hover';
+                glow.style.left = (x - 15) + 'px';
+                glow.style.top = (y - 15) + 'px';
+                document.body.appendChild(glow);
+                window.__currentHoverEffect = glow;
+            },
+            type(x, y) {
+                // Typing indicator; reference kept to remove it later
+                const indicator = document.createElement('div');
+                indicator.className = 'rpai-typing';
+                indicator.style.left = (x + 10) + 'px';
+                indicator.style.top = (y - 20) + 'px';
+                indicator.textContent = '✏️ typing...';
+                document.body.appendChild(indicator);
+                window.__currentTypeEffect = indicator;
+            },
+            clearHover() {
+                if (window.__currentHoverEffect) {
+                    window.__currentHoverEffect.remove();
+                    window.__currentHoverEffect = null;
+                }
+            },
+            clearType() {
+                if (window.__currentTypeEffect) {
+                    window.__currentTypeEffect.remove();
+                    window.__currentTypeEffect = null;
+                }
+            },
+        },
+
+        finish(kind, id) {
+            // Tear down an action's effect and its cursor box together
+            if (kind === 'hover') rpai.effects.clearHover();
+            else if (kind === 'type') rpai.effects.clearType();
+            if (id) rpai.unhighlight(id);
+            rpai.cursor.remove();
+        },
+
+        cleanup(ids) {
+            rpai.cursor.remove();
+            // Only touch the elements we actually highlighted
+            for (const id of ids) {
+                const el = findElement(id);
+                if (el) el.classList.remove('rpai-highlight');
+            }
+        },
+
+        showAll(highlightColor) {
+            // Remove existing tooltips
+            document.querySelectorAll('.element-tooltip').forEach(el => el.remove());
+
+            // Phase 1 - reads only: a single layout pass for every marked element
+            const viewWidth = window.innerWidth;
+            const viewHeight = window.innerHeight;
+            const visible = [];
+            for (const el of document.querySelectorAll('[__elementId]')) {
+                const rect = el.getBoundingClientRect();
+
+                // Skip elements not in viewport or too small
+                if (rect.width < 2 || rect.height < 2 ||
+                    rect.right < 0 || rect.bottom < 0 ||
+                    rect.left > viewWidth || rect.top > viewHeight) {
+                    continue;
+                }
+                visible.push({
+                    el,
+                    rect,
+                    id: el.getAttribute('__elementId'),
+                    text: el.innerText || el.textContent || '',
+                });
+            }
+
+            // Phase 2 - writes only: highlight and outline each visible element
+            for (const { el } of visible) {
+                el.dataset.originalBackgroundColor = el.style.backgroundColor || '';
+                el.style.transition = 'background-color 0.3s ease-in-out';
+                el.style.backgroundColor = highlightColor;
+
+                el.dataset.originalOutline = el.style.outline || '';
+                el.style.outline = '2px dashed red';
+            }
+
+            // Phase 3 - build all tooltips off-DOM and insert them at once
+            const fragment = document.createDocumentFragment();
+            const elementsInfo = [];
+            for (const { el, rect, id, text } of visible) {
+                // Tooltip with element ID, positioned above the element
+                const tooltip = document.createElement('div');
+                tooltip.className = 'element-tooltip';
+                tooltip.textContent = `ID: ${id}`;
+                tooltip.style.left = `${rect.left}px`;
+                tooltip.style.top = `${rect.top - 25}px`;
+                fragment.appendChild(tooltip);
+
+                // Collect element info
+                elementsInfo.push({
+                    id,
+                    tag: el.tagName.toLowerCase(),
+                    text,
+                    position: {
+                        x: rect.left,
+                        y: rect.top,
+                        width: rect.width,
+                        height: rect.height
+                    }
+                });
+            }
+            document.body.appendChild(fragment);
+
+            // Return information about marked elements
+            return {
+                count: elementsInfo.length,
+                elements: elementsInfo
+            };
+        },
+
+        hideAll() {
+            // Remove tooltips
+            document.querySelectorAll('.element-tooltip').forEach(el => el.remove());
+
+            // Restore original styles for all marked elements
+            document.querySelectorAll('[__elementId]').forEach(el => {
+                if (el.dataset.originalBackgroundColor !== undefined) {
+                    el.style.backgroundColor = el.dataset.originalBackgroundColor;
+                    delete el.dataset.originalBackgroundColor;
+                }
+
+                if (el.dataset.originalOutline !== undefined) {
+                    el.style.outline = el.dataset.originalOutline;
+                    delete el.dataset.originalOutline;
+                }
+            });
+        },
+    };
+
+    window.__rpai = rpai;
+})();
+""")
+
+# Stylesheet for every element the helpers create. Added once per document with
+# `page.add_style_tag` (see `AnimationUtilsPlaywright.install_styles`) so the helpers
+# only need to set a class name.
+RPAI_CSS = _minify_js("""
+#red-cursor {
+    width: 12px;
+    height: 12px;
+    position: absolute;
+    border-radius: 50%;
+    z-index: 999999;
+    pointer-events: none;
+    /* A nicer cursor: red ring with a white highlight and a soft shadow */
+    background: radial-gradient(circle at center, #fff 20%, #f00 100%);
+    box-shadow: 0 0 6px 2px rgba(255, 0, 0, 0.5);
+    transition: left 0.1s linear, top 0.1s linear;
+}
+.rpai-highlight {
+    border: 2px solid red !important;
+    transition: border 0.3s ease-in-out;
+}
+.rpai-ripple {
+    position: absolute;
+    width: 40px;
+    height: 40px;
+    border-radius: 50%;
+    background-color: rgba(255, 0, 0, 0.3);
+    pointer-events: none;
+    z-index: 999997;
+    animation: ripple-animation 0.6s ease-out;
+}
+.rpai-hover {
+    position: absolute;
+    width: 30px;
+    height: 30px;
+    border-radius: 50%;
+    box-shadow: 0 0 10px 5px rgba(0, 255, 255, 0.5);
+    pointer-events: none;
+    z-index: 999997;
+    opacity: 0;
+    animation: hover-animation 1s ease-in-out infinite alternate;
+}
+.rpai-typing {
+    position: absolute;
+    padding: 3px 8px;
+    border-radius: 4px;
+    background-color: rgba(0, 0, 0, 0.7);
+    color: white;
+    font-size: 12px;
+    pointer-events: none;
+    z-index: 999997;
+}
+.element-tooltip {
+    position: absolute;
+    background: rgba(0, 0, 0, 0.8);
+    color: white;
+    padding: 5px;
+    border-radius: 3px;
+    font-size: 12px;
+    z-index: 999998;
+    pointer-events: none;
+    max-width: 250px;
+    white-space: nowrap;
+    overflow: hidden;
+    text-overflow: ellipsis;
+}
+@keyframes ripple-animation {
+    0% { transform: scale(0.1); opacity: 1; }
+    100% { transform: scale(2); opacity: 0; }
+}
+@keyframes hover-animation {
+    0% { opacity: 0.2; transform: scale(0.9); }
+    100% { opacity: 0.6; transform: scale(1.1); }
+}
+""")
+
+# True once the cursor animation started by `cursor.glide()` has finished (or was removed)
+_JS_CURSOR_ANIMATION_DONE = _minify_js("""
+() => {
+    const anim = window.__rpai && window.__rpai.cursor._anim;
+    return !anim || anim.playState === 'finished';
+}
+""")
+
+# Per-call expressions over the helper bundle
+_JS_ADD_CURSOR = _minify_js("""
+(id) => window.__rpai.quiet(() => {
+    window.__rpai.highlight(id);
+    window.__rpai.cursor.create();
+    return window.__rpai.track(id);
+})
+""")
+_JS_GLIDE = "(args) => window.__rpai.cursor.glide(...args)"
+_JS_PLAY = "(args) => window.__rpai.cursor.play(...args)"
+_JS_REMOVE_CURSOR = _minify_js("""
+(id) => window.__rpai.quiet(() => {
+    window.__rpai.unhighlight(id);
+    window.__rpai.cursor.remove();
+})
+""")
+_JS_CLEANUP = "(ids) => window.__rpai.quiet(() => window.__rpai.cleanup(ids))"
+_JS_SHOW_ALL = "(color) => window.__rpai.quiet(() => window.__rpai.showAll(color))"
+_JS_HIDE_ALL = "() => window.__rpai.quiet(() => window.__rpai.hideAll())"
+_JS_TRACK = "(id) => window.__rpai.track(id)"
+_JS_EFFECT = "([kind, x, y]) => window.__rpai.quiet(() => window.__rpai.effects[kind](x, y))"
+_JS_TRACK_EFFECT = _minify_js("""
+([kind, id]) => {
+    const box = window.__rpai.track(id);
+    if (box && kind) window.__rpai.quiet(() => window.__rpai.effects[kind](box.x, box.y));
+    return box;
+}
+""")
+_JS_CLEAR_HOVER = "() => window.__rpai.quiet(() => window.__rpai.effects.clearHover())"
+_JS_CLEAR_TYPE = "() => window.__rpai.quiet(() => window.__rpai.effects.clearType())"
+_JS_FINISH = "([kind, id]) => window.__rpai.quiet(() => window.__rpai.finish(kind, id))"
 
 
 class AnimationUtilsPlaywright:
@@ -10,61 +446,100 @@ class AnimationUtilsPlaywright:
 
     def __init__(self) -> None:
         self.last_cursor_position: Tuple[float, float] = (0.0, 0.0)
-        self.highlighted_elements: List[str] = []
+        self.highlighted_elements: Set[str] = set()
+        # Pages that already carry the `window.__rpai` helper bundle
+        self._installed_pages: weakref.WeakSet[Page] = weakref.WeakSet()
+        # Pages whose current document already carries the RPAI_CSS stylesheet
+        self._style_installed: weakref.WeakKeyDictionary[Page, bool] = weakref.WeakKeyDictionary()
+        # page -> elementId -> {x, y, width, height} (element centre); element ids restart
+        # on every page, so each page has its own cache, cleared whenever that page reports
+        # a layout-affecting change, navigates or its animations are cleaned up
+        self._box_cache: weakref.WeakKeyDictionary[Page, Dict[str, Dict[str, float]]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def install(self, page: Page) -> None:
+        """
+        Install the `window.__rpai` helper bundle on the page.
+
+        The bundle is registered as an init script so that it survives navigations, and is
+        also evaluated once for the document that is already loaded. Subsequent calls for
+        the same page only make sure the stylesheet is present in the current document.
+
+        Args:
+            page (Page): The Playwright page object.
+        """
+        if page not in self._installed_pages:
+            try:
+                await page.expose_function("__rpai_invalidate", lambda: self._invalidate_box_cache(page))
+            except Exception:
+                # Binding already registered (e.g. on the browser context)
+                pass
+            page.on("framenavigated", lambda frame: self._on_frame_navigated(page, frame))
+            await page.add_init_script(script=HELPER_JS)
+            await page.evaluate(HELPER_JS)
+            self._installed_pages.add(page)
+        await self.install_styles(page)
+
+    async def install_styles(self, page: Page) -> None:
+        """
+        Add the cursor / effect / tooltip stylesheet to the current document of the page.
+
+        The stylesheet is added at most once per document: the flag is reset on main-frame
+        navigation, so the next helper call after a navigation re-adds it.
+
+        Args:
+            page (Page): The Playwright page object.
+        """
+        if self._style_installed.get(page):
+            return
+        try:
+            await page.add_style_tag(content=RPAI_CSS)
+            self._style_installed[page] = True
+        except Exception:
+            pass
+
+    def _boxes(self, page: Page) -> Dict[str, Dict[str, float]]:
+        return self._box_cache.setdefault(page, {})
+
+    def _invalidate_box_cache(self, page: Page) -> None:
+        self._box_cache.pop(page, None)
+
+    def _on_frame_navigated(self, page: Page, frame: Any) -> None:
+        if frame == page.main_frame:
+            self._box_cache.pop(page, None)
+            # style tags do not survive navigations
+            self._style_installed.pop(page, None)
 
-    async def add_cursor_box(self, page: Page, identifier: str) -> None:
+    async def add_cursor_box(
+        self, page: Page, identifier: str, wait_for_highlight: float = 0.0
+    ) -> None:
         """
         Highlight the element with the given identifier and insert a custom cursor on the page.
 
+        The highlight border transition is purely cosmetic, so by default this returns as soon
+        as the DOM has been updated instead of waiting for the transition to play.
+
         Args:
             page (Page): The Playwright page object.
             identifier (str): The element identifier.
+            wait_for_highlight (float): Optional pause in seconds to let the highlight transition play. Default: 0.0
         """
         try:
-            # 1. Highlight the element (if it exists)
-            await page.evaluate(
-                """
-                (identifier) => {
-                    const elm = document.querySelector(`[__elementId='${identifier}']`);
-                    if (elm) {
-                        elm.style.transition = 'border 0.3s ease-in-out';
-                        elm.style.border = '2px solid red';
-                    }
-                }
-                """,
+            await self.install(page)
+            # Highlight the element and create the cursor in the same evaluate so
+            # both DOM mutations land in a single round-trip / rendering pass.
+            element_box = await page.evaluate(
+                _JS_ADD_CURSOR,
                 identifier,
             )
-            
-            # Track highlighted elements
-            if identifier not in self.highlighted_elements:
-                self.highlighted_elements.append(identifier)
-
-            # Give time for the border transition
-            await asyncio.sleep(0.3)
+            if element_box:
+                self._boxes(page)[identifier] = element_box
 
-            # 2. Create a custom cursor (only if it doesn't already exist)
-            await page.evaluate(
-                """
-                () => {
-                    let cursor = document.getElementById('red-cursor');
-                    if (!cursor) {
-                        cursor = document.createElement('div');
-                        cursor.id = 'red-cursor';
-                        cursor.style.width = '12px';
-                        cursor.style.height = '12px';
-                        cursor.style.position = 'absolute';
-                        cursor.style.borderRadius = '50%';
-                        cursor.style.zIndex = '999999';        // Large z-index to appear on top
-                        cursor.style.pointerEvents = 'none';    // Don't block clicks
-                        // A nicer cursor: red ring with a white highlight and a soft shadow
-                        cursor.style.background = 'radial-gradient(circle at center, #fff 20%, #f00 100%)';
-                        cursor.style.boxShadow = '0 0 6px 2px rgba(255,0,0,0.5)';
-                        cursor.style.transition = 'left 0.1s linear, top 0.1s linear';
-                        document.body.appendChild(cursor);
-                    }
-                }
-                """
-            )
+            # Track highlighted elements
+            self.highlighted_elements.add(identifier)
+            if wait_for_highlight > 0:
+                await asyncio.sleep(wait_for_highlight)
         except Exception:
             pass
 
@@ -77,6 +552,8 @@ class AnimationUtilsPlaywright:
         end_y: float,
         steps: int = 20,
         step_delay: float = 0.05,
+        and_remove: bool = False,
+        identifier: Optional[str] = None,
     ) -> None:
         """
         Animate the cursor movement gradually from start to end coordinates.
@@ -89,46 +566,41 @@ class AnimationUtilsPlaywright:
             end_y (float): The ending y-coordinate.
             steps (int, optional): Number of small steps for the movement. Default: 20
             step_delay (float, optional): Delay (in seconds) between steps. Default: 0.05
+            and_remove (bool, optional): Remove the cursor box once the movement ends, saving the
+                separate `remove_cursor_box` round-trip. Default: False
+            identifier (str, optional): With `and_remove`, the highlighted element to clear. Default: None
         """
-        # Ensure the cursor is on the page
+        # Let the browser drive the whole movement with a single Web Animations
+        # API call instead of one evaluate round-trip per step.
+        duration_ms = steps * step_delay * 1000
         try:
-            for step in range(steps):
-                # Linear interpolation
-                x = start_x + (end_x - start_x) * (step / steps)
-                y = start_y + (end_y - start_y) * (step / steps)
-
-                # Move the cursor via JS
-                await page.evaluate(
-                    """
-                    ([x, y]) => {
-                        const cursor = document.getElementById('red-cursor');
-                        if (cursor) {
-                            cursor.style.left = x + 'px';
-                            cursor.style.top = y + 'px';
-                        }
-                    }
-                    """,
-                    [x, y],
-                )
-
-                await asyncio.sleep(step_delay)
-
-            # Final position
-            await page.evaluate(
-                """
-                ([x, y]) => {
-                    const cursor = document.getElementById('red-cursor');
-                    if (cursor) {
-                        cursor.style.left = x + 'px';
-                        cursor.style.top = y + 'px';
-                    }
-                }
-                """,
-                [end_x, end_y],
+            await self.install(page)
+            started = await page.evaluate(
+                _JS_GLIDE,
+                [start_x, start_y, end_x, end_y, duration_ms, and_remove, identifier],
             )
+            if started is False:
+                # No Web Animations API: ship every intermediate position at once and let
+                # the page play them on animation frames
+                n = max(steps, 1)
+                xs = [start_x + (end_x - start_x) * i / n for i in range(n + 1)]
+                ys = [start_y + (end_y - start_y) * i / n for i in range(n + 1)]
+                await asyncio.wait_for(
+                    page.evaluate(
+                        _JS_PLAY,
+                        [xs, ys, step_delay * 1000, and_remove, identifier],
+                    ),
+                    timeout=steps * step_delay + 1,
+                )
+            elif started:
+                # Wake up once, when the browser reports the animation as finished
+                await page.wait_for_function(
+                    _JS_CURSOR_ANIMATION_DONE, timeout=duration_ms + 500
+                )
         except Exception:
             pass
-            # Store last cursor position if needed
+        if and_remove:
+            self.highlighted_elements.discard(identifier)
         self.last_cursor_position = (end_x, end_y)
 
     async def remove_cursor_box(self, page: Page, identifier: str) -> None:
@@ -140,28 +612,15 @@ class AnimationUtilsPlaywright:
             identifier (str): The element identifier.
         """
         try:
+            await self.install(page)
             await page.evaluate(
-                """
-                (identifier) => {
-                    // Remove highlight
-                    const elm = document.querySelector(`[__elementId='${identifier}']`);
-                    if (elm) {
-                        elm.style.border = '';
-                    }
-                    // Remove cursor
-                    const cursor = document.getElementById('red-cursor');
-                    if (cursor) {
-                        cursor.remove();
-                    }
-                }
-                """,
+                _JS_REMOVE_CURSOR,
                 identifier,
             )
-            
+
             # Remove from highlighted elements list
-            if identifier in self.highlighted_elements:
-                self.highlighted_elements.remove(identifier)
-                
+            self.highlighted_elements.discard(identifier)
+
         except Exception:
             pass
 
@@ -174,352 +633,159 @@ class AnimationUtilsPlaywright:
             page (Page): The Playwright page object.
         """
         try:
-            # Remove cursor and highlights using the same approach as in remove_cursor_box
+            await self.install(page)
             await page.evaluate(
-                """
-                () => {
-                    // Remove cursor
-                    const cursor = document.getElementById('red-cursor');
-                    if (cursor) {
-                        cursor.remove();
-                    }
-                    // Remove highlights from all elements
-                    const elements = document.querySelectorAll('[__elementId]');
-                    elements.forEach(el => {
-                        if (el.style.border && el.style.transition) {
-                            el.style.border = '';
-                            el.style.transition = '';
-                        }
-                    });
-                }
-                """
+                _JS_CLEANUP,
+                list(self.highlighted_elements),
             )
+            self._box_cache.pop(page, None)
             # Reset the last cursor position
             self.last_cursor_position = (0.0, 0.0)
             # Clear highlighted elements list
-            self.highlighted_elements = []
+            self.highlighted_elements.clear()
         except Exception:
             pass
-            
+
     async def show_all_marked_elements(self, page: Page, highlight_color: str = "rgba(255, 0, 0, 0.2)") -> Dict[str, Any]:
         """
         Highlight all elements with __elementId attribute to make them visible on the screen.
         Also returns information about the marked elements.
-        
+
         Args:
             page (Page): The Playwright page object
             highlight_color (str): CSS color for the highlight. Default: "rgba(255, 0, 0, 0.2)"
-            
+
         Returns:
             Dict[str, Any]: Information about marked elements (id, text, position)
         """
         try:
+            await self.install(page)
             # Show all marked elements with a highlight and tooltip
-            element_info = await page.evaluate(
-                """
-                (highlightColor) => {
-                    // Create a style for tooltips if it doesn't exist
-                    let tooltipStyle = document.getElementById('element-tooltip-style');
-                    if (!tooltipStyle) {
-                        tooltipStyle = document.createElement('style');
-                        tooltipStyle.id = 'element-tooltip-style';
-                        tooltipStyle.innerHTML = `
-                            .element-tooltip {
-                                position: absolute;
-                                background: rgba(0, 0, 0, 0.8);
-                                color: white;
-                                padding: 5px;
-                                border-radius: 3px;
-                                font-size: 12px;
-                                z-index: 999998;
-                                pointer-events: none;
-                                max-width: 250px;
-                                white-space: nowrap;
-                                overflow: hidden;
-                                text-overflow: ellipsis;
-                            }
-                        `;
-                        document.head.appendChild(tooltipStyle);
-                    }
-                    
-                    // Remove existing tooltips
-                    document.querySelectorAll('.element-tooltip').forEach(el => el.remove());
-                    
-                    // Find all elements with __elementId
-                    const markedElements = document.querySelectorAll('[__elementId]');
-                    const elementsInfo = [];
-                    
-                    markedElements.forEach(el => {
-                        const id = el.getAttribute('__elementId');
-                        const rect = el.getBoundingClientRect();
-                        
-                        // Skip elements not in viewport or too small
-                        if (rect.width < 2 || rect.height < 2 || 
-                            rect.right < 0 || rect.bottom < 0 || 
-                            rect.left > window.innerWidth || rect.top > window.innerHeight) {
-                            return;
-                        }
-                        
-                        // Highlight the element
-                        el.dataset.originalBackgroundColor = el.style.backgroundColor || '';
-                        el.style.transition = 'background-color 0.3s ease-in-out';
-                        el.style.backgroundColor = highlightColor;
-                        
-                        // Add outline
-                        el.dataset.originalOutline = el.style.outline || '';
-                        el.style.outline = '2px dashed red';
-                        
-                        // Create tooltip with element ID
-                        const tooltip = document.createElement('div');
-                        tooltip.className = 'element-tooltip';
-                        tooltip.textContent = `ID: ${id}`;
-                        
-                        // Position tooltip above the element
-                        tooltip.style.left = `${rect.left}px`;
-                        tooltip.style.top = `${rect.top - 25}px`;
-                        
-                        // Add tooltip to body
-                        document.body.appendChild(tooltip);
-                        
-                        // Collect element info
-                        elementsInfo.push({
-                            id,
-                            tag: el.tagName.toLowerCase(),
-                            text: el.innerText || el.textContent || '',
-                            position: {
-                                x: rect.left,
-                                y: rect.top,
-                                width: rect.width,
-                                height: rect.height
-                            }
-                        });
-                    });
-                    
-                    // Return information about marked elements
-                    return {
-                        count: elementsInfo.length,
-                        elements: elementsInfo
-                    };
-                }
-                """,
-                highlight_color,
-            )
-            
+            element_info = await page.evaluate(_JS_SHOW_ALL, highlight_color)
             return element_info
         except Exception as e:
             print(f"Error showing marked elements: {e}")
             return {"count": 0, "elements": []}
-    
+
     async def hide_all_marked_elements(self, page: Page) -> None:
         """
         Remove highlights from all marked elements and their tooltips.
-        
+
         Args:
             page (Page): The Playwright page object
         """
         try:
-            await page.evaluate(
-                """
-                () => {
-                    // Remove tooltips
-                    document.querySelectorAll('.element-tooltip').forEach(el => el.remove());
-                    
-                    // Restore original styles for all marked elements
-                    document.querySelectorAll('[__elementId]').forEach(el => {
-                        if (el.dataset.originalBackgroundColor !== undefined) {
-                            el.style.backgroundColor = el.dataset.originalBackgroundColor;
-                            delete el.dataset.originalBackgroundColor;
-                        }
-                        
-                        if (el.dataset.originalOutline !== undefined) {
-                            el.style.outline = el.dataset.originalOutline;
-                            delete el.dataset.originalOutline;
-                        }
-                    });
-                }
-                """
-            )
+            await self.install(page)
+            await page.evaluate(_JS_HIDE_ALL)
         except Exception as e:
             print(f"Error hiding marked elements: {e}")
-            
+
     async def add_action_effect(self, page: Page, action_type: str, element_id: Optional[str] = None, coords: Optional[Tuple[float, float]] = None) -> None:
         """
         Add visual effect for different action types (click, hover, etc.)
-        
+
         Args:
             page (Page): The Playwright page object
             action_type (str): Type of action ('click', 'hover', 'type', etc.)
             element_id (Optional[str]): Element ID if action is on an element
             coords (Optional[Tuple[float, float]]): Coordinates if action is at a position
+
+        Note:
+            Everything this needs to know about the element is read in a single evaluate
+            (one round-trip, one layout pass). If more element data is ever needed here
+            (text, state, attributes), extend that evaluate body rather than issuing
+            separate `page.evaluate` / `locator.*()` calls.
         """
         try:
+            await self.install(page)
+            kind = action_type if action_type in ("click", "hover", "type") else None
             if element_id:
-                # Get element position
-                element_box = await page.evaluate(
-                    """
-                    (id) => {
-                        const el = document.querySelector(`[__elementId='${id}']`);
-                        if (!el) return null;
-                        const rect = el.getBoundingClientRect();
-                        return {
-                            x: rect.left + rect.width/2,
-                            y: rect.top + rect.height/2,
-                            width: rect.width,
-                            height: rect.height
-                        };
-                    }
-                    """,
-                    element_id
-                )
-                
-                if not element_box:
+                # Get element position (reuse the cached box while the page is unchanged)
+                boxes = self._boxes(page)
+                element_box = boxes.get(element_id)
+                if element_box is None:
+                    # Cache miss: measure the element and play the effect in one round-trip
+                    element_box = await page.evaluate(_JS_TRACK_EFFECT, [kind, element_id])
+                    if element_box:
+                        boxes[element_id] = element_box
                     return
-                    
+
                 x, y = element_box["x"], element_box["y"]
             elif coords:
                 x, y = coords
             else:
                 return
-                
+
             # Create animation based on action type
-            if action_type == "click":
+            if kind:
                 await page.evaluate(
-                    """
-                    ([x, y]) => {
-                        // Create ripple effect
-                        const ripple = document.createElement('div');
-                        ripple.style.position = 'absolute';
-                        ripple.style.left = (x - 20) + 'px';
-                        ripple.style.top = (y - 20) + 'px';
-                        ripple.style.width = '40px';
-                        ripple.style.height = '40px';
-                        ripple.style.borderRadius = '50%';
-                        ripple.style.backgroundColor = 'rgba(255, 0, 0, 0.3)';
-                        ripple.style.pointerEvents = 'none';
-                        ripple.style.zIndex = '999997';
-                        ripple.style.animation = 'ripple-animation 0.6s ease-out';
-                        
-                        // Add animation if not exists
-                        if (!document.getElementById('ripple-keyframes')) {
-                            const style = document.createElement('style');
-                            style.id = 'ripple-keyframes';
-                            style.innerHTML = `
-                                @keyframes ripple-animation {
-                                    0% { transform: scale(0.1); opacity: 1; }
-                                    100% { transform: scale(2); opacity: 0; }
-                                }
-                            `;
-                            document.head.appendChild(style);
-                        }
-                        
-                        document.body.appendChild(ripple);
-                        
-                        // Remove after animation completes
-                        setTimeout(() => {
-                            ripple.remove();
-                        }, 600);
-                    }
-                    """,
-                    [x, y]
-                )
-            elif action_type == "hover":
-                await page.evaluate(
-                    """
-                    ([x, y]) => {
-                        // Create hover glow effect
-                        const glow = document.createElement('div');
-                        glow.style.position = 'absolute';
-                        glow.style.left = (x - 15) + 'px';
-                        glow.style.top = (y - 15) + 'px';
-                        glow.style.width = '30px';
-                        glow.style.height = '30px';
-                        glow.style.borderRadius = '50%';
-                        glow.style.boxShadow = '0 0 10px 5px rgba(0, 255, 255, 0.5)';
-                        glow.style.pointerEvents = 'none';
-                        glow.style.zIndex = '999997';
-                        glow.style.opacity = '0';
-                        glow.style.animation = 'hover-animation 1s ease-in-out infinite alternate';
-                        
-                        // Add animation if not exists
-                        if (!document.getElementById('hover-keyframes')) {
-                            const style = document.createElement('style');
-                            style.id = 'hover-keyframes';
-                            style.innerHTML = `
-                                @keyframes hover-animation {
-                                    0% { opacity: 0.2; transform: scale(0.9); }
-                                    100% { opacity: 0.6; transform: scale(1.1); }
-                                }
-                            `;
-                            document.head.appendChild(style);
-                        }
-                        
-                        document.body.appendChild(glow);
-                        
-                        // Store reference to remove later
-                        window.__currentHoverEffect = glow;
-                    }
-                    """,
-                    [x, y]
-                )
-            elif action_type == "type":
-                await page.evaluate(
-                    """
-                    ([x, y]) => {
-                        // Create typing indicator
-                        const indicator = document.createElement('div');
-                        indicator.style.position = 'absolute';
-                        indicator.style.left = (x + 10) + 'px';
-                        indicator.style.top = (y - 20) + 'px';
-                        indicator.style.padding = '3px 8px';
-                        indicator.style.borderRadius = '4px';
-                        indicator.style.backgroundColor = 'rgba(0, 0, 0, 0.7)';
-                        indicator.style.color = 'white';
-                        indicator.style.fontSize = '12px';
-                        indicator.style.pointerEvents = 'none';
-                        indicator.style.zIndex = '999997';
-                        indicator.innerHTML = '✏️ typing...';
-                        
-                        document.body.appendChild(indicator);
-                        
-                        // Store reference to remove later
-                        window.__currentTypeEffect = indicator;
-                    }
-                    """,
-                    [x, y]
+                    _JS_EFFECT,
+                    [kind, x, y],
                 )
         except Exception as e:
             print(f"Error adding action effect: {e}")
-            
+
     async def remove_action_effect(self, page: Page, action_type: str) -> None:
         """
         Remove action effect by type
-        
+
         Args:
             page (Page): The Playwright page object
             action_type (str): Type of action ('click', 'hover', 'type', etc.)
         """
         try:
+            await self.install(page)
             if action_type == "hover":
-                await page.evaluate(
-                    """
-                    () => {
-                        if (window.__currentHoverEffect) {
-                            window.__currentHoverEffect.remove();
-                            window.__currentHoverEffect = null;
-                        }
-                    }
-                    """
-                )
+                await page.evaluate(_JS_CLEAR_HOVER)
             elif action_type == "type":
-                await page.evaluate(
-                    """
-                    () => {
-                        if (window.__currentTypeEffect) {
-                            window.__currentTypeEffect.remove();
-                            window.__currentTypeEffect = null;
-                        }
-                    }
-                    """
-                )
+                await page.evaluate(_JS_CLEAR_TYPE)
         except Exception as e:
             print(f"Error removing action effect: {e}")
+
+    async def animate_action(
+        self,
+        page: Page,
+        action_type: str,
+        element_id: Optional[str],
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+    ) -> None:
+        """
+        Move the cursor and show the action effect at the same time.
+
+        The cursor movement and the effect touch disjoint parts of the DOM, so both
+        evaluates are issued concurrently instead of one after the other.
+
+        Args:
+            page (Page): The Playwright page object
+            action_type (str): Type of action ('click', 'hover', 'type', etc.)
+            element_id (Optional[str]): Element ID if action is on an element
+            start (Tuple[float, float]): Cursor start coordinates
+            end (Tuple[float, float]): Cursor end coordinates
+        """
+        await self.install(page)
+        await asyncio.gather(
+            self.gradual_cursor_animation(page, start[0], start[1], end[0], end[1]),
+            self.add_action_effect(page, action_type, element_id, None if element_id else end),
+        )
+
+    async def finish_action(self, page: Page, action_type: str, identifier: Optional[str] = None) -> None:
+        """
+        Remove the action effect and the cursor box in a single evaluate.
+
+        Equivalent to `remove_action_effect` followed by `remove_cursor_box`.
+
+        Args:
+            page (Page): The Playwright page object
+            action_type (str): Type of action ('click', 'hover', 'type', etc.)
+            identifier (Optional[str]): The highlighted element identifier, if any
+        """
+        try:
+            await self.install(page)
+            await page.evaluate(
+                _JS_FINISH,
+                [action_type, identifier],
+            )
+            self.highlighted_elements.discard(identifier)
+        except Exception as e:
+            logger.debug("Error finishing action animation: %s", e)
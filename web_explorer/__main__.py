@@ -3,6 +3,11 @@ import argparse
 import logging
 from .exploration_policy import ExplorationAgent
 
+try:
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None  # type: ignore
+
 logging.basicConfig(level=logging.INFO)
 
 
@@ -13,8 +18,14 @@ def main() -> None:
     parser.add_argument("--out", default="run_artifacts", help="Directory to save run artefacts")
     parser.add_argument("--max-depth", type=int, default=2, help="Maximum number of distinct abstract states to visit")
     parser.add_argument("--max-steps", type=int, default=20, help="Maximum number of actions to execute")
-    parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to sleep after each state transition")
+    parser.add_argument("--sleep", type=float, default=2.0, help="Maximum seconds to wait for the page to settle after each action")
     parser.add_argument("--animate", action="store_true", help="Enable animations and visual feedback for actions")
+    parser.add_argument(
+        "--block-assets",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Abort image/font/stylesheet/media requests (default: off)",
+    )
     args = parser.parse_args()
 
     # If animations are enabled, ensure we're not in headless mode
@@ -30,12 +41,15 @@ def main() -> None:
         max_steps=args.max_steps,
         state_sleep=args.sleep,
         animate_actions=args.animate,  # Pass the animate flag to enable visual feedback
+        block_assets=args.block_assets,
     )
     
     print(f"Starting exploration of {args.url}")
     print(f"Animation mode: {'ENABLED' if args.animate else 'DISABLED'}")
     
-    knowledge = asyncio.run(agent.explore())
+    # uvloop is an optional, faster drop-in event loop
+    run = uvloop.run if uvloop is not None else asyncio.run
+    knowledge = run(agent.explore())
     print("Exploration finished. Abstract states:", len(knowledge.abstract_states))
     print("Abstract actions:", len(knowledge.abstract_actions))
 
@@ -3,16 +3,12 @@ from __future__ import annotations
 """App-wide target action selector (Section 3.3.2)."""
 
 import random
-from typing import List
 from .knowledge import AppKnowledge, AbstractAction, ExplorationFlag
 
 
 class ActionSelector:
     """Random but app-wide selector that prefers unexplored actions in the current state."""
 
-    def __init__(self) -> None:
-        pass
-
     def select_action(
         self, K: AppKnowledge, current_state_id: str | None
     ) -> AbstractAction | None:
@@ -20,21 +16,31 @@ class ActionSelector:
 
         1. If there are unexplored actions in *current_state*, pick one randomly.
         2. Else, consider unexplored actions across *all* states and pick randomly.
+
+        Actions flagged `is_external` are never returned; they are marked ineffective
+        when drawn.
         """
-        if current_state_id and current_state_id in K.abstract_states:
-            st = K.abstract_states[current_state_id]
-            candidates: List[AbstractAction] = [
-                a for a in st.actions.values() if a.exploration_flag == ExplorationFlag.UNEXPLORED
-            ]
-            if candidates:
-                candidates.sort(key=lambda a: a.action_id)
-                return candidates[0]
+        # Both lookups use the incrementally maintained unexplored indices on `K`
+        # rather than scanning every action.
+        if current_state_id:
+            action = self._pick(K, K.unexplored_by_state.get(current_state_id))
+            if action is not None:
+                return action
 
         # fallback: global unexplored
-        global_candidates: List[AbstractAction] = [
-            a for a in K.abstract_actions.values() if a.exploration_flag == ExplorationFlag.UNEXPLORED
-        ]
-        if global_candidates:
-            global_candidates.sort(key=lambda a: a.action_id)
-            return global_candidates[0]
-        return None 
\ No newline at end of file
+        return self._pick(K, K.unexplored_action_ids)
+
+    def _pick(self, K: AppKnowledge, action_ids: set[str] | None) -> AbstractAction | None:
+        if not action_ids:
+            return None
+        # copy once per call; drawn ids are swap-removed, so skipping external ones stays O(1)
+        pool = list(action_ids)
+        while pool:
+            i = random.randrange(len(pool))
+            pool[i], pool[-1] = pool[-1], pool[i]
+            action = K.abstract_actions[pool.pop()]
+            if not action.is_external:
+                return action
+            # links leaving the site are never worth executing; retire them for good
+            K.update_action_flag(action, ExplorationFlag.INEFFECTIVE)
+        return None
@@ -6,17 +6,257 @@ For now we implement an extremely naive behaviour that treats each interactive
 region (as produced by `playwright_custom.page_script.js`) as its own action.
 """
 
-from typing import Any, Dict, List
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Tuple
 
-from dotenv import load_dotenv
-load_dotenv()
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# OpenAI clients are created on first use so that importing this module (or only
+# hitting the heuristic fallback) does not read .env or set up HTTP clients.
+_client = None
+_aclient = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        from openai import OpenAI
+        _client = OpenAI()
+    return _client
+
+
+def _get_aclient():
+    global _aclient
+    if _aclient is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        from openai import AsyncOpenAI
+        _aclient = AsyncOpenAI()
+    return _aclient
+
+# Instructions shared by every grouping request; sent once as the system message
+SYSTEM_PROMPT = (
+    "Please think step by step:\n"
+    "Page description: give a short (<20 words) natural-language description of what this page is for.\n"
+    "Elements description: give a summary (<20 words) of *all* clickable / input elements.\n"
+    "Same-function elements: Group element_ids ONLY if they clearly serve EXACTLY the same function.\n"
+    "IMPORTANT: DO NOT group main navigation links together. DO NOT group search results together.\n"
+    "Each link to a different page should be its own group, even if they look similar.\n\n"
+    "Answer with the fields page_description, element_description and same_function_elements "
+    "(a list of {elements: [element_id...], function: <str>}).\n"
+)
+
+# Per-page user message; only the {html} / {raw} parts vary between calls
+PROMPT_TEMPLATE = (
+    "Now suppose you are analysing a GUI page of a web app, the current page shows the following HTML snippet (truncated):\n"
+    "<page_html>\n{html}\n</page_html>\n\n"
+    "Here are the interactive elements (pre-extracted):\n{raw}\n"
+)
+
+HTML_PREVIEW_CHARS = 3500  # characters of page HTML shown to the LLM
+
+
+def _html_preview(html: Any) -> str:
+    """Return the first HTML_PREVIEW_CHARS characters of *html* (str or raw bytes)."""
+    if isinstance(html, (bytes, bytearray)):
+        # slice before decoding so only the preview goes through the decoder
+        return bytes(html[:HTML_PREVIEW_CHARS]).decode("utf-8", "replace")
+    if not html:
+        return ""
+    return html if len(html) <= HTML_PREVIEW_CHARS else html[:HTML_PREVIEW_CHARS]
+
+
+class ElementGroup(BaseModel):
+    """A set of element ids that serve exactly the same function."""
+
+    elements: List[str]
+    function: str
+
+
+class PageGrouping(BaseModel):
+    """Structured LLM answer for a single page."""
+
+    page_description: str
+    element_description: str
+    same_function_elements: List[ElementGroup]
+
+
+# (element_id, action_type, function, xpath) of one interactive element
+_RawRow = Tuple[str, str, str, str]
+
+
+@functools.lru_cache(maxsize=1024)
+def _dump_rows(rows: Tuple[_RawRow, ...]) -> str:
+    """Canonical JSON of the raw elements, shared by the prompt and the cache key.
+
+    Pure and memoised on the element rows, so revisited pages skip re-serialising.
+    Elements keep their DOM order (meaningful to the model and stable for the same
+    page); keys and separators are fixed so identical pages give byte-identical prompts.
+    """
+    return json.dumps(
+        [{"action_type": a, "element_id": i, "function": f, "xpath": x} for i, a, f, x in rows],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+
+
+_EMPTY: Dict[str, Any] = {}  # shared read-only default for dict lookups
+
+GroupingResult = tuple[List[Dict[str, Any]], str, List[Dict[str, Any]]]
+
+
+class _Page(NamedTuple):
+    """Everything the grouper derives from one snapshot before asking the LLM."""
+
+    raw: List[Dict[str, str]]            # one entry per interactive element
+    raw_json: str                        # canonical JSON of all elements (cache key)
+    prompt_json: str                     # canonical JSON of de-duplicated elements (prompt)
+    n_prompt: int                        # number of elements in prompt_json
+    expansion: Dict[str, List[str]]      # prompted element id -> all ids it stands for
+    interactive_rects: Dict[str, Any]
+    html_preview: str
 
-from openai import OpenAI
-client = OpenAI()
 
 class ElementGrouper:
+    CACHE_SIZE = 512  # max. number of memoised LLM groupings kept per grouper
+    MAX_CONCURRENCY = 10  # in-flight requests from extract_actions_async
+    GROUPING_THRESHOLD = 4  # pages with at most this many elements are not sent to the LLM
+
     def __init__(self) -> None:
         self.token_usage: int = 0  # rough accounting of prompt + completion tokens
+        self._sem = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        # sha256(page preview + raw elements) -> (actions, page_desc, element_groups), LRU order
+        self._cache: OrderedDict[bytes, GroupingResult] = OrderedDict()
+
+    @staticmethod
+    def _token_budget(n_elements: int) -> int:
+        """Completion-token ceiling for grouping *n_elements* elements.
+
+        Roughly 16 tokens per element (one `{"elements":[...],"function":...}` entry each
+        in the worst case) on top of the two descriptions, clamped to [512, 2048].
+        """
+        return max(512, min(2048, 96 + 16 * n_elements))
+
+    @staticmethod
+    def _cache_key(page_html_preview: str, raw_str: str) -> bytes:
+        return hashlib.sha256(f"{page_html_preview}\0{raw_str}".encode("utf-8")).digest()
+
+    def _cache_get(self, key: bytes) -> GroupingResult | None:
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        self._cache.move_to_end(key)
+        return copy.deepcopy(cached)
+
+    def _cache_put(self, key: bytes, result: GroupingResult) -> None:
+        self._cache[key] = copy.deepcopy(result)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _gather(state_snapshot: Any) -> _Page:
+        """Extract the raw elements of a snapshot and what is sent to / cached for the LLM."""
+        interactive_rects = state_snapshot.get("interactive_rects", {}) if isinstance(state_snapshot, dict) else {}
+        rows: Tuple[_RawRow, ...] = tuple(
+            (
+                # ids arrive as JSON object keys, i.e. already strings
+                elem_id if type(elem_id) is str else str(elem_id),
+                info.get("default_action", "click"),
+                info.get("aria_label", ""),
+                info.get("xpath", ""),
+            )
+            for elem_id, info in interactive_rects.items()
+        )
+        raw: List[Dict[str, str]] = [
+            {"action_type": a, "element_id": i, "function": f, "xpath": x} for i, a, f, x in rows
+        ]
+
+        # Collapse true duplicates (same action, label and full xpath, e.g. an element
+        # reported twice under different ids) into their first occurrence before
+        # prompting. Look-alikes at different xpaths – links to different pages, say –
+        # are left for the LLM to group, as SYSTEM_PROMPT asks.
+        expansion: Dict[str, List[str]] = {}
+        prompt_rows: List[_RawRow] = []
+        first_by_sig: Dict[Tuple[str, str, str], str] = {}
+        for row in rows:
+            elem_id, a_type, label, xpath = row
+            if xpath:
+                sig = (a_type, label, xpath)
+                rep = first_by_sig.get(sig)
+                if rep is not None:
+                    expansion[rep].append(elem_id)
+                    continue
+                first_by_sig[sig] = elem_id
+            expansion[elem_id] = [elem_id]
+            prompt_rows.append(row)
+
+        page_html_preview = _html_preview(state_snapshot.get("html", "")) if isinstance(state_snapshot, dict) else ""
+        return _Page(
+            raw=raw,
+            raw_json=_dump_rows(rows),
+            prompt_json=_dump_rows(tuple(prompt_rows)),
+            n_prompt=len(prompt_rows),
+            expansion=expansion,
+            interactive_rects=interactive_rects,
+            html_preview=page_html_preview,
+        )
+
+    @staticmethod
+    def _parsed(resp: Any) -> Any:
+        """Return the schema-validated answer of a `parse` response (raises on refusal)."""
+        parsed = resp.choices[0].message.parsed
+        if parsed is None:
+            raise ValueError(f"LLM refused grouping request: {resp.choices[0].message.refusal}")
+        return parsed
+
+    @staticmethod
+    def _assemble_actions(parsed: PageGrouping, page: _Page) -> GroupingResult:
+        """Turn one parsed LLM answer into (grouped_actions, page_description, element_groups)."""
+        raw, interactive_rects, expansion = page.raw, page.interactive_rects, page.expansion
+        element_groups: List[Dict[str, Any]] = [g.model_dump() for g in parsed.same_function_elements]
+        page_desc: str = parsed.page_description
+
+        # Build grouped-actions list: pick first element in each group as representative
+        actions: List[Dict[str, str]] = []
+
+        for g in element_groups:
+            if not g["elements"]:
+                continue
+            # the response schema already guarantees string ids; re-attach the
+            # look-alike elements that were collapsed before prompting
+            g["elements"] = [m for eid in g["elements"] for m in expansion.get(eid, (eid,))]
+            representative_id = g["elements"][0]
+            # One dict lookup per group; building an id index over every element
+            # would cost a full pass over `raw` to save nothing here.
+            info = interactive_rects.get(representative_id, _EMPTY)
+            actions.append({
+                "action_type": info.get("default_action", "click"),
+                "element_id": representative_id,
+                "function": g["function"],
+                "elements": g["elements"],
+                "xpath": info.get("xpath", ""),
+            })
+
+        # Fallback: if LLM groups empty or clearly too aggressive (1-2 groups for many elements)
+        if not actions or (len(actions) <= 2 and len(raw) > 5):
+            logger.warning(
+                "LLM grouping looks aggressive (%d groups for %d elements). Using one-action-per-element instead.",
+                len(actions), len(raw),
+            )
+            actions = raw
+        return actions, page_desc, element_groups
 
     # ------------------------------------------------------------------
     def extract_actions(self, state_snapshot: Any) -> tuple[List[Dict[str, str]], str, List[Dict[str, Any]], int]:
@@ -24,82 +264,79 @@ class ElementGrouper:
 
         The implementation follows the four-module prompt structure in Fig-2 of the paper.
         If the LLM request fails we fall back to heuristic grouping – one action per element –
-        and leave description/element_groups empty.
+        and leave description/element_groups empty. The same fallback is used without asking
+        the LLM when the page has no more than ``GROUPING_THRESHOLD`` elements.
+
+        Results are memoised on the (HTML preview, elements) content, so a page seen
+        before is answered without another LLM request; ``token_usage`` is the number of
+        tokens spent by this call (0 on a cache hit).
         """
 
         # 1) Gather raw elements first -----------------------------------
-        raw: List[Dict[str, str]] = []
-        interactive_rects = state_snapshot.get("interactive_rects", {}) if isinstance(state_snapshot, dict) else {}
-        for elem_id, info in interactive_rects.items():
-            raw.append({
-                "action_type": info.get("default_action", "click"),
-                "element_id": str(elem_id),
-                "function": info.get("aria_label", ""),
-                "xpath": info.get("xpath", ""),
-            })
+        page = self._gather(state_snapshot)
+        # nothing worth grouping – skip the LLM round-trip
+        if len(page.raw) <= self.GROUPING_THRESHOLD:
+            logger.debug("Skipping LLM grouping for page with %d elements", len(page.raw))
+            return page.raw, "", [], 0
+
+        key = self._cache_key(page.html_preview, page.raw_json)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return (*cached, 0)
 
         # 2) If LLM available – ask it to merge & describe ---------------
+        try:
+            resp = _get_client().chat.completions.parse(**self._request(page))
+            return self._handle_response(resp, key, page)
+        except Exception:
+            # fall back to heuristic one-action-per-element
+            return page.raw, "", [], 0
 
-        page_html_preview = state_snapshot.get("html", "")[:3500] if isinstance(state_snapshot, dict) else ""
+    async def extract_actions_async(self, state_snapshot: Any) -> tuple[List[Dict[str, str]], str, List[Dict[str, Any]], int]:
+        """Async variant of :meth:`extract_actions` that does not block the event loop.
 
-        try:
-            prompt = (
-                f"Now suppose you are analysing a GUI page of a web app, the current page shows the following HTML snippet (truncated):\n"
-                f"<page_html>\n{page_html_preview}\n</page_html>\n\n"
-                "Please think step by step:\n"
-                "Page description: give a short (<20 words) natural-language description of what this page is for.\n"
-                "Elements description: give a summary (<20 words) of *all* clickable / input elements.\n"
-                "Same-function elements: Group element_ids ONLY if they clearly serve EXACTLY the same function.\n"
-                "IMPORTANT: DO NOT group main navigation links together. DO NOT group search results together.\n"
-                "Each link to a different page should be its own group, even if they look similar.\n\n"
-                "You should respond in JSON with the following keys:\n"
-                "{\n  \"Page description\": <str>,\n  \"Element description\": <str>,\n  \"Same-function elements\": [ {\"elements\": [id...], \"function\": <str>} ]\n}\n\n"
-                f"Here are the interactive elements (pre-extracted):\n{raw}\n"
-            )
+        Several calls may be awaited concurrently (e.g. with ``asyncio.gather``); at most
+        ``MAX_CONCURRENCY`` requests are in flight at once.
+        """
+        page = self._gather(state_snapshot)
+        if len(page.raw) <= self.GROUPING_THRESHOLD:
+            return page.raw, "", [], 0
 
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=512,
-            )
-            self.token_usage += resp.usage.total_tokens if resp and resp.usage else 0
+        key = self._cache_key(page.html_preview, page.raw_json)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return (*cached, 0)
+
+        try:
+            async with self._sem:
+                resp = await _get_aclient().chat.completions.parse(**self._request(page))
+            return self._handle_response(resp, key, page)
+        except Exception:
+            return page.raw, "", [], 0
 
-            content = resp.choices[0].message.content.strip()
-            # Debug logging
-            print(f"LLM response for element grouping:\n{content[:500]}...(truncated)")
-            import json, re
-            # ensure valid json (sometimes trailing code fences)
-            content_json_str = re.sub(r"```[a-zA-Z]*", "", content).strip("` ")
-            parsed = json.loads(content_json_str)
+    @classmethod
+    def _request(cls, page: _Page) -> Dict[str, Any]:
+        """Chat-completion arguments for grouping a single page."""
+        prompt = PROMPT_TEMPLATE.format_map({"html": page.html_preview, "raw": page.prompt_json})
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "response_format": PageGrouping,
+            "temperature": 0,
+            "max_tokens": cls._token_budget(page.n_prompt),
+        }
 
-            element_groups: List[Dict[str, Any]] = parsed.get("Same-function elements", [])
-            page_desc: str = parsed.get("Page description", "")
+    def _handle_response(
+        self, resp: Any, key: bytes, page: _Page
+    ) -> tuple[List[Dict[str, str]], str, List[Dict[str, Any]], int]:
+        used_tokens = resp.usage.total_tokens if resp and resp.usage else 0
+        self.token_usage += used_tokens
 
-            # Build grouped-actions list: pick first element in each group as representative
-            actions: List[Dict[str, str]] = []
-            original_type: dict[str, str] = {str(r["element_id"]): r["action_type"] for r in raw}
+        logger.debug("LLM response for element grouping:\n%.500s...(truncated)", resp.choices[0].message.content)
+        result = self._assemble_actions(self._parsed(resp), page)
 
-            for g in element_groups:
-                if not g.get("elements"):
-                    continue
-                # normalise ids to string
-                g["elements"] = [str(eid) for eid in g["elements"]]
-                representative_id = str(g["elements"][0])
-                a_type = original_type.get(representative_id, "click")
-                actions.append({
-                    "action_type": a_type,
-                    "element_id": representative_id,
-                    "function": g.get("function", ""),
-                    "elements": g["elements"],
-                    "xpath": interactive_rects.get(representative_id, {}).get("xpath", ""),
-                })
-
-            # Fallback: if LLM groups empty or clearly too aggressive (1-2 groups for many elements)
-            if not actions or (len(actions) <= 2 and len(raw) > 5):
-                print(f"WARNING: LLM grouping looks aggressive ({len(actions)} groups for {len(raw)} elements). Using one-action-per-element instead.")
-                actions = raw
-            return actions, page_desc, element_groups, self.token_usage
-        except Exception:
-            # fall back to heuristic one-action-per-element
-            return raw, "", [], 0 
\ No newline at end of file
+        self._cache_put(key, result)
+        return (*result, used_tokens)
@@ -3,14 +3,21 @@ from __future__ import annotations
 """Algorithm 2 – the main exploration driver for Web-Explorer."""
 
 import asyncio
+import hashlib
 import logging
 from typing import Any, Dict, List, Optional, Tuple
 import os, shutil
+from collections import OrderedDict
 import json
 import networkx as nx
 from urllib.parse import urlparse
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Route
 
 from playwright_custom.browser.local_playwright_browser import LocalPlaywrightBrowser
 from playwright_custom.playwright_controller import PlaywrightController
@@ -21,10 +28,155 @@ from .action_selector import ActionSelector
 from .path_finder import PathFinder
 from .state_matcher import StateMatcher
 from .input_generator import InputTextGenerator
+from .element_grouper import ElementGrouper
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Resource types that never influence the DOM structure / interactive elements we explore
+BLOCKED_RESOURCE_TYPES = {
+    "beacon",
+    "csp_report",
+    "font",
+    "image",
+    "imageset",
+    "media",
+    "object",
+    "texttrack",
+    "stylesheet",
+}
+
+
+# JS function deciding whether clicking `el` would leave the explored site
+_IS_EXTERNAL_JS = """
+const WWW_PREFIX = /^www\\./;
+function isExternal(el, origin) {
+  // If no href, it's not a link - so not external
+  const href = el.getAttribute('href');
+  if (!href) return false;
+
+  // Relative paths are always internal
+  if (href.startsWith('/') || href.startsWith('#') || href.startsWith('./') || href.startsWith('../')) {
+    return false;
+  }
+
+  // For absolute URLs, check the domain
+  try {
+    const a = document.createElement('a');
+    a.href = href;
+    // Empty hostname means it's a relative URL
+    if (!a.hostname) return false;
+
+    const host = a.hostname.replace(WWW_PREFIX, '');
+    const originHost = origin.replace(WWW_PREFIX, '');
+
+    // Allow subdomain variations - strip to domain.tld
+    const hostParts = host.split('.');
+    const originParts = originHost.split('.');
+
+    // Take last 2 parts (domain.tld) if long enough
+    const mainDomain = hostParts.length >= 2 ?
+          hostParts.slice(-2).join('.') : host;
+    const originDomain = originParts.length >= 2 ?
+          originParts.slice(-2).join('.') : originHost;
+
+    return mainDomain !== originDomain && host !== originHost;
+  } catch(e) {
+    // If parsing fails, err on the side of caution
+    return false;
+  }
+}
+"""
+
+# Maps requested element ids to [absolute xpath, isExternal]; args are [ids, origin]
+_XPATHS_JS = """
+(args) => {
+    const [ids, origin] = args;
+""" + _IS_EXTERNAL_JS + """
+    // Absolute XPath of an element, built bottom-up
+    function getXPathForElement(element) {
+        const segments = [];
+        let el = element;
+        while (el && el.nodeType === 1) {
+            if (el === document.body) {
+                segments.push('/html/body');
+                break;
+            }
+            // Position among siblings with the same tag
+            let position = 1;
+            for (let sib = el.previousElementSibling; sib; sib = sib.previousElementSibling) {
+                if (sib.tagName === el.tagName) position++;
+            }
+            segments.push('/' + el.tagName.toLowerCase() + '[' + position + ']');
+            el = el.parentNode;
+        }
+        return segments.reverse().join('');
+    }
+
+    const want = new Set(ids);
+    const result = {};
+    for (const el of document.querySelectorAll('[__elementId]')) {
+        const id = el.getAttribute('__elementId');
+        if (want.has(id)) {
+            result[id] = [getXPathForElement(el), isExternal(el, origin)];
+        }
+    }
+    return result;
+}
+"""
+
+# Whether the element with the given `__elementId` is an external link; args are [id, origin]
+_IS_EXTERNAL_BY_ID_JS = """
+(args) => {
+  const [id, origin] = args;
+""" + _IS_EXTERNAL_JS + """
+  const el = document.querySelector(`[__elementId="${id}"]`);
+  return el ? isExternal(el, origin) : false;
+}
+"""
+
+# Resolves once the DOM has seen no mutations for `quietMs`, or after `maxMs` at the latest;
+# args are [quietMs, maxMs]
+_DOM_QUIET_JS = """
+(args) => new Promise((resolve) => {
+  const [quietMs, maxMs] = args;
+  let timer = null;
+  const done = () => { observer.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(); };
+  const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, quietMs); });
+  observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  const cap = setTimeout(done, maxMs);
+  timer = setTimeout(done, quietMs);
+})
+"""
+
+DOM_QUIET_MS = 300  # a same-URL action counts as settled after this long without DOM mutations
+
+
+def _dumps(obj: Any) -> str:
+    """Pretty-print `obj` as JSON, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bit; the stdlib encoder handles those
+    return json.dumps(obj, indent=2)
+
+
+def _write_text(path: str, data: str) -> None:
+    try:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(data)
+    except Exception as e:
+        logger.warning(f"Failed to write {path}: {e}")
+
+
+class _PlainGraphMLWriter(nx.readwrite.graphml.GraphMLWriter):
+    """GraphML writer that drops attributes GraphML cannot represent (e.g. the `obj` back-references)."""
+
+    def add_attributes(self, scope, xml_obj, data, default):
+        plain = {k: v for k, v in data.items() if isinstance(v, (str, int, float, bool))}
+        super().add_attributes(scope, xml_obj, plain, default)
+
 
 class ExplorationAgent:
     """High-level orchestrator implementing the exploration loop."""
@@ -38,25 +190,39 @@ class ExplorationAgent:
         max_steps: int = 100,
         state_sleep: float = 2.0,
         animate_actions: bool = False,
+        block_assets: bool = False,
+        context: BrowserContext | None = None,
     ) -> None:
+        """Create an agent for `start_url`.
+
+        By default the agent launches (and closes) its own browser. To explore many URLs
+        with a single driver and browser, start Playwright once, create a context
+        (`await (await playwright.chromium.launch()).new_context()`) and pass it as
+        `context` to each agent; `explore()` then only opens and closes its own page.
+        """
         self.start_url = start_url
+        self._context = context
         self._browser_wrapper = LocalPlaywrightBrowser(headless=headless)
         # create domain allowlist
         self._origin = urlparse(start_url).netloc
+        # same-origin URLs start with this prefix; checked before falling back to urlparse
+        self._origin_prefix = f"{urlparse(start_url).scheme}://{self._origin}/"
 
         async def _validator(url: str):
-            allow = urlparse(url).netloc == self._origin or urlparse(url).netloc == ""
+            allow = self._is_same_origin(url)
             return ("blocked" if not allow else "ok", allow)
 
         self._controller = PlaywrightController(
             url_validation_callback=_validator,
             animate_actions=animate_actions,
-            sleep_after_action=state_sleep,
+            # no blind sleep in the controller; _wait_until_settled bounds the wait instead
+            sleep_after_action=0,
         )
         self._output_dir = output_dir
         self._max_depth = max_depth
         self._max_steps = max_steps
         self._state_sleep = state_sleep
+        self._block_assets = block_assets
 
         if os.path.exists(self._output_dir):
             shutil.rmtree(self._output_dir)
@@ -64,42 +230,84 @@ class ExplorationAgent:
 
         # Knowledge related components
         self._knowledge = AppKnowledge()
-        self._maintainer = KnowledgeMaintainer(StateMatcher())
+        # verdicts persist next to the other artefacts of this run only
+        self._state_matcher = StateMatcher(equiv_db=os.path.join(self._output_dir, "equiv.sqlite"))
+        self._maintainer = KnowledgeMaintainer(self._state_matcher)
         self._selector = ActionSelector()
         self._path_finder = PathFinder()
         self._input_gen = InputTextGenerator()
+        # one grouper for the whole run so that its LLM response cache is shared
+        self._grouper = ElementGrouper()
 
         # progress tracking
         self._visited_state_ids: set[str] = set()
         self._steps_executed: int = 0
         self._no_path_counter: int = 0
         self._no_path_limit: int = 20
-        self._all_elements: dict[str, Any] = {}
-        self._sig_cache: dict[str, dict[str, Any]] = {}
+        # persist knowledge every N executed actions
+        self._checkpoint_every: int = 25
+        # AIG version last written to aig.graphml
+        self._graphml_version: Optional[Tuple[int, int]] = None
+        # every N restarts the browser context is replaced to bound memory growth
+        self._restarts: int = 0
+        self._recycle_every: int = 5
+        # all three are LRU-bounded so long runs keep a bounded working set
+        self._all_elements: OrderedDict[str, Any] = OrderedDict()
+        self._all_elements_max: int = 20000
+        self._sig_cache: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._sig_cache_max: int = 500
+        # hash of the serialised interactive rects -> screenshot file already taken for them
+        self._shot_cache: OrderedDict[str, str] = OrderedDict()
+        self._shot_cache_max: int = 2000
+        # interactive rects of the current page; fetched at most once between two actions
+        self._rects_cache: Optional[dict[str, Any]] = None
+        # elementId -> "is external link" for the current page, filled with the xpaths
+        self._external_cache: dict[str, bool] = {}
+        # background artefact writes still in flight
+        self._pending_writes: set[asyncio.Task] = set()
         # back-tracking support ------------------------------------------------
         self._state_stack: list[str] = []
+        # mirror of `_state_stack` for O(1) membership checks
+        self._state_stack_set: set[str] = set()
 
     # ------------------------------------------------------------------
     async def explore(self) -> AppKnowledge:
         """Entry-point of the algorithm."""
 
+        if self._context is not None:
+            # shared context owned by the caller: use (and close) our own page only
+            page: Page = await self._context.new_page()
+            try:
+                if self._block_assets:
+                    await page.route("**/*", self._block_asset_route)
+                return await self._explore(page)
+            finally:
+                await page.close()
+
         async with self._browser_wrapper as bw:  # type: ignore
             context: BrowserContext = self._browser_wrapper.browser_context  # type: ignore
-            page: Page = await context.new_page()
-            await page.goto(self.start_url)
-            await asyncio.sleep(1)
-            await page.wait_for_load_state("load")
-
-            # Initial state snapshot and knowledge
-            state_snapshot = await self._get_state_snapshot(page)
-            self._knowledge = self._maintainer.update_knowledge(
-                self._knowledge, None, None, state_snapshot
-            )
-            current_abs_state_id = self._get_matching_abs_state_id(state_snapshot)
-            logger.debug("Initial state: %s (%s)", current_abs_state_id, page.url)
+            if self._block_assets:
+                await context.route("**/*", self._block_asset_route)
+            page = await context.new_page()
+            return await self._explore(page)
+
+    async def _explore(self, page: Page) -> AppKnowledge:
+        """Run the exploration loop on `page`."""
+        await page.goto(self.start_url)
+        await asyncio.sleep(1)
+        await page.wait_for_load_state("load")
+
+        # Initial state snapshot and knowledge
+        state_snapshot = await self._get_state_snapshot(page)
+        self._knowledge = self._maintainer.update_knowledge(
+            self._knowledge, None, None, state_snapshot
+        )
+        current_abs_state_id = self._get_matching_abs_state_id(state_snapshot)
+        logger.debug("Initial state: %s (%s)", current_abs_state_id, page.url)
 
-            nav_steps: List[AbstractAction] = []
+        nav_steps: List[AbstractAction] = []
 
+        try:
             while self._should_continue():
                 # 1. Determine next action -----------------------------------
                 if nav_steps:
@@ -109,12 +317,6 @@ class ExplorationAgent:
                     next_action = self._selector.select_action(
                         self._knowledge, current_abs_state_id
                     )
-                    # Skip actions that are definitely external links --------------------
-                    while next_action and next_action.actual_elements and \
-                          await self._would_navigate_external(page, next_action.actual_elements[0].node_id):
-                        logger.info("Pre-filter: action %s is external – marking ineffective", next_action.action_id)
-                        self._knowledge.update_action_flag(next_action, ExplorationFlag.INEFFECTIVE)
-                        next_action = self._selector.select_action(self._knowledge, current_abs_state_id)
                     if next_action is None:
                         logger.info("All actions explored.")
                         break
@@ -125,10 +327,11 @@ class ExplorationAgent:
                         logger.debug("Current URL: %s | State: %s | Stack: %s", 
                                    page.url, current_abs_state_id, self._state_stack)
                         # push current state for back-tracking if it still has work
-                        if any(a.exploration_flag == ExplorationFlag.UNEXPLORED for a in current_state.actions.values()):
-                            if current_abs_state_id not in self._state_stack:
+                        if self._knowledge.unexplored_in_state(current_abs_state_id):
+                            if current_abs_state_id not in self._state_stack_set:
                                 logger.debug("Pushing state %s to stack (Url: %s)", current_abs_state_id, page.url)
                                 self._state_stack.append(current_abs_state_id)
+                                self._state_stack_set.add(current_abs_state_id)
                         nav_steps = self._path_finder.find_path(
                             self._knowledge, current_state, next_action
                         )
@@ -142,12 +345,13 @@ class ExplorationAgent:
                         self._no_path_counter = 0  # reset when successful
 
                 # 2. Execute action -----------------------------------------
-                concrete_action_info = await self._execute_action(page, next_action)
+                url_before = page.url
+                concrete_action_info = await self._execute_action(page, next_action, state_snapshot)
 
                 # 3. Observe new state & update knowledge -------------------
-                await page.wait_for_timeout(self._state_sleep * 1000)
+                await self._wait_until_settled(page, url_before)
                 new_state_snapshot = await self._get_state_snapshot(page)
-                
+            
                 # First update knowledge with cached grouped actions
                 self._knowledge = self._maintainer.update_knowledge(
                     self._knowledge,
@@ -163,6 +367,12 @@ class ExplorationAgent:
                 # update progress trackers
                 self._visited_state_ids.add(current_abs_state_id)
                 self._steps_executed += 1
+                if self._steps_executed % self._checkpoint_every == 0:
+                    try:
+                        self._checkpoint()
+                    except Exception:
+                        # a failed save must not end the exploration
+                        logger.exception("Periodic checkpoint failed – continuing exploration")
 
                 # If we are in navigation mode (nav_steps not empty) but new state no longer matches
                 if nav_steps:
@@ -183,7 +393,12 @@ class ExplorationAgent:
                 # Restart from start URL if too many consecutive no-path situations
                 if self._no_path_counter >= self._no_path_limit:
                     logger.warning("Too many navigation-failures – restarting application context")
+                    self._restarts += 1
+                    # an injected context belongs to the caller and is never recycled
+                    if self._context is None and self._restarts % self._recycle_every == 0:
+                        page = await self._recycle_page(page)
                     await page.goto(self.start_url, wait_until="load")
+                    self._reset_page_caches()
                     state_snapshot = await self._get_state_snapshot(page)
                     current_abs_state_id = self._get_matching_abs_state_id(state_snapshot)
                     self._no_path_counter = 0
@@ -192,16 +407,17 @@ class ExplorationAgent:
                 current_state_obj = self._knowledge.abstract_states[current_abs_state_id]
                 logger.debug("Checking if state %s is finished. Unexplored: %d, Stack: %s", 
                            current_abs_state_id, 
-                           sum(1 for a in current_state_obj.actions.values() if a.exploration_flag == ExplorationFlag.UNEXPLORED),
+                           len(self._knowledge.unexplored_in_state(current_abs_state_id)),
                            self._state_stack)
-                if not any(a.exploration_flag == ExplorationFlag.UNEXPLORED for a in current_state_obj.actions.values()):
+                if not self._knowledge.unexplored_in_state(current_abs_state_id):
                     logger.debug("Current state %s is finished, looking for previous states to return to", current_abs_state_id)
                     # current state finished; try to pop a previous state with remaining work
                     while self._state_stack:
                         target_state_id = self._state_stack.pop()
+                        self._state_stack_set.discard(target_state_id)
                         logger.debug("Popped %s from stack", target_state_id)
                         target_state_obj = self._knowledge.abstract_states.get(target_state_id)
-                        if target_state_obj and any(a.exploration_flag == ExplorationFlag.UNEXPLORED for a in target_state_obj.actions.values()):
+                        if target_state_obj and self._knowledge.unexplored_in_state(target_state_id):
                             nav_steps = self._path_finder.path_to_state(
                                 self._knowledge, current_state_obj, target_state_obj
                             )
@@ -213,109 +429,152 @@ class ExplorationAgent:
                                 logger.warning("Could not find path back to state %s", target_state_id)
                     if not self._state_stack and not nav_steps:
                         logger.debug("Stack empty, no more states to return to")
-
-            # Save final knowledge graph & trace
-            with open(os.path.join(self._output_dir, "knowledge.json"), "w", encoding="utf-8") as fh:
-                json.dump(self._knowledge.to_json(), fh, indent=2)
-
-            # Prepare sanitized graph for GraphML (remove non-serialisable objects)
-            g_raw = self._knowledge.aig.to_networkx()
-            g_ml = nx.MultiDiGraph()
-            for nid, data in g_raw.nodes(data=True):
-                g_ml.add_node(nid)
-            for u, v, k, data in g_raw.edges(keys=True, data=True):
-                g_ml.add_edge(u, v, key=k)
+        finally:
+            # Save knowledge graph & trace, also when the loop is aborted by an error
+            await self._flush_writes()
             try:
-                nx.write_graphml(g_ml, os.path.join(self._output_dir, "aig.graphml"))
-            except Exception as e:
-                logger.warning(f"Failed to write GraphML: {e}")
+                self._checkpoint()
+            except Exception:
+                # do not mask the error that ended the loop, if any
+                logger.exception("Final checkpoint failed")
+
+        return self._knowledge
+
+    # ------------------------------------------------------------------
+    # Helpers -----------------------------------------------------------
+
+    def _checkpoint(self) -> None:
+        """Persist the knowledge, the AIG and the element table to the output directory.
+
+        Called periodically from the main loop and once when exploration ends, so an
+        aborted run keeps everything learned up to its last checkpoint. Files are written
+        to a temporary path first and swapped in atomically.
+        """
+        self._write_json_atomic("knowledge.json", self._knowledge.to_json())
 
-            # write master elements
+        # GraphML only changes with the graph structure
+        aig = self._knowledge.aig
+        if self._graphml_version != (id(aig), aig.version):
             try:
-                with open(os.path.join(self._output_dir, "elements_all.json"), "w", encoding="utf-8") as fh:
-                    json.dump(self._all_elements, fh, indent=2)
+                writer = _PlainGraphMLWriter()
+                writer.add_graph_element(aig.to_networkx())
+                path = os.path.join(self._output_dir, "aig.graphml")
+                with open(path + ".tmp", "wb") as fh:
+                    writer.dump(fh)
+                os.replace(path + ".tmp", path)
+                self._graphml_version = (id(aig), aig.version)
             except Exception as e:
-                logger.warning(f"Failed to write elements_all.json: {e}")
+                logger.warning(f"Failed to write GraphML: {e}")
 
-            return self._knowledge
+        # write master elements
+        try:
+            self._write_json_atomic("elements_all.json", self._all_elements)
+        except Exception as e:
+            logger.warning(f"Failed to write elements_all.json: {e}")
 
-    # ------------------------------------------------------------------
-    # Helpers -----------------------------------------------------------
+    def _write_json_atomic(self, filename: str, obj: Any) -> None:
+        path = os.path.join(self._output_dir, filename)
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            fh.write(_dumps(obj))
+        os.replace(path + ".tmp", path)
 
     async def _get_state_snapshot(self, page: Page) -> Any:
         """Collect metadata from page and interactive rects for matching."""
-        metadata = await self._controller.get_page_metadata(page)
-        # save html/screenshot
-        html_path = os.path.join(self._output_dir, f"state_{len(self._knowledge.raw_trace)}.html")
-        screenshot_path = os.path.join(self._output_dir, f"state_{len(self._knowledge.raw_trace)}.png")
+        # independent page round-trips; let them overlap
+        metadata, interactive_rects = await asyncio.gather(
+            self._controller.get_page_metadata(page), self._get_rects(page)
+        )
         # Include the URL in metadata for state differentiation
         metadata["url"] = page.url
-        
-        try:
-            content = await page.content()
-            with open(html_path, "w", encoding="utf-8") as fh:
-                fh.write(content)
-            await self._controller.get_screenshot(page, path=screenshot_path)
-        except Exception:
-            pass
-        metadata["html"] = html_path
-        interactive_rects = await self._controller.get_interactive_rects(page)
         # compute xpaths ---------------------------------------------------
         xpaths: dict[str, str] = await self._compute_xpaths(page, list(interactive_rects.keys()))
+        # single pass: attach xpaths and feed the master aggregation with the same dicts
+        snapshot_rects: dict[str, Any] = {}
         for eid, info in interactive_rects.items():
             info_with_xpath = dict(info)
             if eid in xpaths:
                 info_with_xpath["xpath"] = xpaths[eid]
             interactive_rects[eid] = info_with_xpath
-
-        metadata["interactive_rects"] = {k: dict(v) for k, v in interactive_rects.items()}
+            snapshot_rects[eid] = info_with_xpath
+            if eid in self._all_elements:
+                self._all_elements.move_to_end(eid)
+            else:
+                self._all_elements[eid] = info_with_xpath
+                if len(self._all_elements) > self._all_elements_max:
+                    self._all_elements.popitem(last=False)
+        metadata["interactive_rects"] = snapshot_rects
+        # let the knowledge maintainer flag actions on external links once, at registration
+        metadata["external_elements"] = [eid for eid, external in self._external_cache.items() if external]
 
         # Debug XPath generation
         logger.debug(f"XPaths computed: {len(xpaths)} out of {len(interactive_rects)} elements")
 
-        # signature for caching
-        sig = StateMatcher().signature(metadata)
+        # signature for caching; stored on the snapshot so later matching reuses it
+        sig = self._state_matcher.signature(metadata)
+        metadata["signature"] = sig
 
         if sig in self._sig_cache:
+            # revisit: reuse the html/screenshot/elements files of the first visit
             cached = self._sig_cache[sig]
+            self._sig_cache.move_to_end(sig)
+            metadata["html"] = cached["html_file"]
+            metadata["screenshot"] = cached["screenshot_file"]
             grouped_actions = cached["grouped_actions"]
             grouped_json_path = cached["grouped_file"]
             elements_json_path = cached["elements_file"]
             metadata["page_description"] = cached.get("page_desc", "")
             metadata["element_groups"] = cached.get("element_groups", [])
         else:
-            # persist per-snapshot element data ---------------------------------
-            elements_json_path = os.path.join(self._output_dir, f"elements_{len(self._knowledge.raw_trace)}.json")
+            # save html/screenshot (first visit of this state only)
+            html_path = os.path.join(self._output_dir, f"state_{len(self._knowledge.raw_trace)}.html")
+            screenshot_path = os.path.join(self._output_dir, f"state_{len(self._knowledge.raw_trace)}.png")
+            elements_json = _dumps(metadata["interactive_rects"])
+            # identical interactive elements (ids, text, boxes) -> reuse the earlier screenshot
+            shot_key = hashlib.blake2b(elements_json.encode("utf-8"), digest_size=8).hexdigest()
             try:
-                with open(elements_json_path, "w", encoding="utf-8") as fh:
-                    json.dump(metadata["interactive_rects"], fh, indent=2)
+                if shot_key in self._shot_cache:
+                    screenshot_path = self._shot_cache[shot_key]
+                    self._shot_cache.move_to_end(shot_key)
+                    content = await page.content()
+                else:
+                    content, _ = await asyncio.gather(
+                        page.content(), self._controller.get_screenshot(page, path=screenshot_path)
+                    )
+                    self._shot_cache[shot_key] = screenshot_path
+                    if len(self._shot_cache) > self._shot_cache_max:
+                        self._shot_cache.popitem(last=False)
+                self._write_in_background(html_path, content)
             except Exception:
                 pass
+            metadata["html"] = html_path
+            metadata["screenshot"] = screenshot_path
+
+            # persist per-snapshot element data ---------------------------------
+            elements_json_path = os.path.join(self._output_dir, f"elements_{len(self._knowledge.raw_trace)}.json")
+            self._write_in_background(elements_json_path, elements_json)
 
-            from .element_grouper import ElementGrouper
-            eg = ElementGrouper()
-            grouped_actions, page_desc, element_groups, token_usage = eg.extract_actions(metadata)
+            grouped_actions, page_desc, element_groups, token_usage = await self._grouper.extract_actions_async(metadata)
 
             grouped_json_path = os.path.join(self._output_dir, f"grouped_actions_{len(self._knowledge.raw_trace)}.json")
-            try:
-                with open(grouped_json_path, "w", encoding="utf-8") as fh:
-                    json.dump({
-                        "grouped_actions": grouped_actions,
-                        "page_description": page_desc,
-                        "element_groups": element_groups,
-                        "token_usage": token_usage,
-                    }, fh, indent=2)
-            except Exception:
-                pass
+            self._write_in_background(grouped_json_path, _dumps({
+                "grouped_actions": grouped_actions,
+                "page_description": page_desc,
+                "element_groups": element_groups,
+                "token_usage": token_usage,
+            }))
 
             # cache it
             self._sig_cache[sig] = {
                 "grouped_actions": grouped_actions,
                 "grouped_file": grouped_json_path,
                 "elements_file": elements_json_path,
+                "html_file": html_path,
+                "screenshot_file": screenshot_path,
                 "page_desc": page_desc,
                 "element_groups": element_groups,
             }
+            if len(self._sig_cache) > self._sig_cache_max:
+                self._sig_cache.popitem(last=False)
 
             # attach LLM outputs to metadata so that KnowledgeMaintainer can persist them
             metadata["page_description"] = page_desc
@@ -324,23 +583,36 @@ class ExplorationAgent:
 
         metadata["grouped_actions_file"] = grouped_json_path
         metadata["grouped_actions"] = grouped_actions
+        return metadata
 
-        # if element file not yet written (cached) ensure file exists
-        if not os.path.exists(elements_json_path):
-            try:
-                with open(elements_json_path, "w", encoding="utf-8") as fh:
-                    json.dump(metadata["interactive_rects"], fh, indent=2)
-            except Exception:
-                pass
+    def _write_in_background(self, path: str, data: str) -> None:
+        """Write `data` to `path` on a worker thread so disk I/O overlaps with the next browser call."""
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(_write_text, path, data))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
 
-        # update master aggregation
-        for eid, meta in metadata["interactive_rects"].items():
-            if eid not in self._all_elements:
-                self._all_elements[eid] = meta
-        return metadata
+    async def _flush_writes(self) -> None:
+        """Wait for all background file writes to finish."""
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    def _reset_page_caches(self) -> None:
+        """Forget everything cached about the current DOM (call whenever it may change)."""
+        self._rects_cache = None
+        self._external_cache.clear()
+
+    async def _get_rects(self, page: Page) -> dict[str, Any]:
+        """Return the interactive rects of the page, reusing them until the next action.
+
+        `_get_state_snapshot` adds the xpath of each element to the cached entries, so
+        `_is_action_available` can also match elements by xpath.
+        """
+        if self._rects_cache is None:
+            self._rects_cache = await self._controller.get_interactive_rects(page)
+        return self._rects_cache
 
     def _get_matching_abs_state_id(self, snapshot: Any) -> str:
-        st = StateMatcher().match_state(self._knowledge, snapshot)
+        st = self._state_matcher.match_state(self._knowledge, snapshot)
         assert st, "State should have been inserted into knowledge already"
         return st.state_id
 
@@ -359,7 +631,7 @@ class ExplorationAgent:
             return False
         elem = action.actual_elements[0]
         elem_id = elem.node_id
-        rects = await self._controller.get_interactive_rects(page)
+        rects = await self._get_rects(page)
         if elem_id in rects:
             return True
 
@@ -370,12 +642,16 @@ class ExplorationAgent:
                 if info.get("xpath") == target_xpath:
                     # Update cached id so future clicks use new value
                     logger.debug("Element id changed – updating from %s to %s", elem_id, rid)
-                    elem.node_id = rid
+                    self._knowledge.rename_element(action, elem, rid)
                     return True
         return False
 
-    async def _execute_action(self, page: Page, action: AbstractAction) -> dict:
-        """Perform the abstract action concretely on the page and return info."""
+    async def _execute_action(self, page: Page, action: AbstractAction, cur_snapshot: Any) -> dict:
+        """Perform the abstract action concretely on the page and return info.
+
+        `cur_snapshot` is the snapshot of the page the action runs on; it provides the
+        context for generated input text.
+        """
         if not action.actual_elements:
             raise RuntimeError("Action has no concrete elements")
         elem_id = action.actual_elements[0].node_id
@@ -408,9 +684,11 @@ class ExplorationAgent:
                                 actual_elements=[element],
                                 function_desc=action.function_desc
                             )
+                            current_state = action.source_abs_state
+                            next_elem_action.source_abs_state = current_state
                             self._knowledge.register_action(next_elem_action)
-                            current_state = self._knowledge.abstract_states[current_abs_state_id] 
-                            current_state.actions[next_elem_action.action_id] = next_elem_action
+                            if current_state is not None:
+                                current_state.actions[next_elem_action.action_id] = next_elem_action
                             break
                 return action_result
             
@@ -426,30 +704,20 @@ class ExplorationAgent:
             await self._controller.show_marked_elements(page)
             await asyncio.sleep(1)  # Allow time to see the elements
         
+        # whatever happens below may change the DOM
+        self._reset_page_caches()
         try:
             if action.action_type.value == "click":
-                # Add click effect animation before actual click if animations enabled
-                if self._controller.animate_actions:
-                    await self._controller.add_action_effect(page, "click", elem_id)
-                    await asyncio.sleep(0.5)
-                    
-                # Perform the click
+                # Perform the click (the controller plays the click effect when animating)
                 await self._controller.click_id(page.context, page, elem_id)
                 
             elif action.action_type.value == "input":
-                # Add typing effect animation if animations enabled
-                if self._controller.animate_actions:
-                    await self._controller.add_action_effect(page, "type", elem_id)
-                    await asyncio.sleep(0.5)
-                    
-                # Generate text and fill the input
-                text = await self._input_gen.generate(await self._get_state_snapshot(page), {})
+                # Generate text and fill the input (the controller shows the typing effect)
+                rects = cur_snapshot.get("interactive_rects", {}) if isinstance(cur_snapshot, dict) else {}
+                xpath = rects.get(elem_id, {}).get("xpath") or action.actual_elements[0].description
+                text = await self._input_gen.generate(cur_snapshot, {"id": elem_id, "xpath": xpath})
                 await self._controller.fill_id(page, elem_id, text)
-                
-                # Remove typing effect
-                if self._controller.animate_actions:
-                    await self._controller.remove_action_effect(page, "type")
-                    
+
             elif action.action_type.value == "scroll":
                 # Add hover effect animation if animations enabled
                 if self._controller.animate_actions:
@@ -460,21 +728,15 @@ class ExplorationAgent:
                 await self._controller.scroll_id(page, elem_id, direction="down")
                 
             elif action.action_type.value == "long_click":
-                # Add click effect animation if animations enabled
-                if self._controller.animate_actions:
-                    await self._controller.add_action_effect(page, "click", elem_id)
-                    await asyncio.sleep(0.5)
-                    
                 await self._controller.click_id(page.context, page, elem_id, hold=1.0)
             # add more types as needed
 
             # after performing, attempt to close extra tabs if single-tab mode desired
-            await self._ensure_single_tab(page.context)
+            await self._ensure_single_tab(page)
 
             # domain enforcement: if navigation changed domain, revert and mark ineffective
             try:
-                current_netloc = urlparse(page.url).netloc
-                if current_netloc != self._origin and current_netloc != "":
+                if not self._is_same_origin(page.url):
                     logger.warning("Navigated outside allowed domain – reverting and marking action ineffective.")
                     self._knowledge.update_action_flag(action, ExplorationFlag.INEFFECTIVE)
                     try:
@@ -494,141 +756,96 @@ class ExplorationAgent:
 
         return action_result
 
-    async def _ensure_single_tab(self, context: BrowserContext) -> None:
+    def _is_same_origin(self, url: str) -> bool:
+        """True when `url` stays on the start URL's host (or has no host, e.g. about:blank)."""
+        if url.startswith(self._origin_prefix) or url.startswith("about:"):
+            return True
+        netloc = urlparse(url).netloc
+        return netloc == self._origin or netloc == ""
+
+    async def _recycle_page(self, page: Page) -> Page:
+        """Swap the browser context for a fresh one and return its new page.
+
+        Long runs accumulate DOM/JS memory, cookies and storage in the context; a fresh
+        context starts clean. Falls back to the current page if recycling fails.
+        """
+        try:
+            context = await self._browser_wrapper.recycle_context()
+            if self._block_assets:
+                await context.route("**/*", self._block_asset_route)
+            new_page = await context.new_page()
+        except Exception:
+            logger.exception("Browser context recycling failed – keeping current page")
+            return page
+        logger.info("Recycled browser context after %d restarts", self._restarts)
+        self._reset_page_caches()
+        return new_page
+
+    async def _wait_until_settled(self, page: Page, url_before: str) -> None:
+        """Wait for the page to settle after an action, at most `state_sleep` seconds.
+
+        Navigations wait for network idle; actions that stay on the same URL (e.g. opening
+        a menu or an XHR-driven update) wait until the DOM has stopped changing.
+        """
+        if self._state_sleep <= 0:
+            return
+        timeout_ms = int(self._state_sleep * 1000)
+        try:
+            if page.url == url_before:
+                await page.evaluate(_DOM_QUIET_JS, [min(DOM_QUIET_MS, timeout_ms), timeout_ms])
+            else:
+                await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+        except Exception:
+            pass
+
+    async def _block_asset_route(self, route: Route) -> None:
+        """Abort requests for images, fonts, stylesheets, etc. to speed up navigation."""
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _ensure_single_tab(self, page: Page) -> None:
         """Close background tabs to keep exploration deterministic."""
-        pages = context.pages
-        # keep first page open
-        for p in pages[1:]:
+        for p in page.context.pages:
+            # keep the exploration page open
+            if p is page:
+                continue
             try:
+                # in a shared context only close tabs our page opened
+                if self._context is not None and await p.opener() is not page:
+                    continue
                 await p.close()
             except Exception:
                 pass
 
     async def _compute_xpaths(self, page: Page, element_ids: list[str]) -> dict[str, str]:
-        """Return mapping elementId -> absolute xpath string for all DOM elements.
-        
-        This uses the raw DOM structure for all elements on the page, not just
-        interactives with __elementId attributes, since PlaywrightController might
-        use other selectors.
+        """Return mapping elementId -> absolute xpath string for the given element ids.
+
+        Only elements carrying one of the requested `__elementId` attributes are visited,
+        instead of computing an xpath for every node of the DOM. The same evaluate also
+        classifies each element as external link or not and stores the result in
+        `self._external_cache`, which `_would_navigate_external` consults first.
         """
         if not element_ids:
             return {}
-            
-        js = """
-        () => {
-            // General XPath computation for any element
-            function getXPathForElement(element) {
-                // If no element or not an element node, return empty string
-                if (!element || element.nodeType !== 1) {
-                    return '';
-                }
-                
-                // Special cases
-                if (element === document.body) {
-                    return '/html/body';
-                }
-                
-                // Get all siblings of the same type
-                let siblings = Array.from(element.parentNode.childNodes)
-                    .filter(node => node.nodeType === 1 && node.tagName === element.tagName);
-                
-                // Count position among siblings
-                let position = 1;
-                for (let i = 0; i < siblings.length; i++) {
-                    if (siblings[i] === element) {
-                        break;
-                    }
-                    position++;
-                }
-                
-                // Build the path recursively
-                return getXPathForElement(element.parentNode) + '/' + 
-                       element.tagName.toLowerCase() + '[' + position + ']';
-            }
-            
-            // Track all elements, indexed by the DOM's natural id
-            const elementXPaths = {};
-            
-            // Process all elements on the page
-            const allElements = document.querySelectorAll('*');
-            for (let i = 0; i < allElements.length; i++) {
-                const el = allElements[i];
-                
-                // Store by both element id and data-id if available
-                if (el.id) {
-                    elementXPaths['#' + el.id] = getXPathForElement(el);
-                }
-                
-                // Store special attributes for interactive elements
-                if (el.hasAttribute('__elementId')) {
-                    elementXPaths[el.getAttribute('__elementId')] = getXPathForElement(el);
-                }
-                
-                // Also capture numeric attributes that might be PlaywrightController's IDs
-                const attributes = el.attributes;
-                for (let j = 0; j < attributes.length; j++) {
-                    const attr = attributes[j];
-                    if (attr.name === '__elementId' || !isNaN(attr.value)) {
-                        elementXPaths[attr.value] = getXPathForElement(el);
-                    }
-                }
-            }
-            
-            return elementXPaths;
-        }
-        """
+
         try:
-            res = await page.evaluate(js)
-            return {str(k): str(v) for k, v in res.items() if k in element_ids}
+            res = await page.evaluate(_XPATHS_JS, [element_ids, self._origin])
         except Exception:
             logger.exception("XPath extraction failed")
             return {}
+        xpaths: dict[str, str] = {}
+        for k, (xpath, external) in res.items():
+            xpaths[str(k)] = str(xpath)
+            self._external_cache[str(k)] = bool(external)
+        return xpaths
 
     async def _would_navigate_external(self, page: Page, element_id: str) -> bool:
+        cached = self._external_cache.get(element_id)
+        if cached is not None:
+            return cached
         try:
-            js = """
-            (args) => {
-              const [id, origin] = args;
-              const selector = `[__elementId="${id}"]`;
-              const el = document.querySelector(selector);
-              if (!el) return false;
-              
-              // If no href, it's not a link - so not external
-              const href = el.getAttribute('href');
-              if (!href) return false;
-              
-              // Relative paths are always internal
-              if (href.startsWith('/') || href.startsWith('#') || href.startsWith('./') || href.startsWith('../')) {
-                return false;
-              }
-              
-              // For absolute URLs, check the domain
-              try {
-                const a = document.createElement('a');
-                a.href = href;
-                // Empty hostname means it's a relative URL
-                if (!a.hostname) return false;
-                
-                const host = a.hostname.replace(/^www\\./, '');
-                const originHost = origin.replace(/^www\\./, '');
-                
-                // Allow subdomain variations - strip to domain.tld
-                const hostParts = host.split('.');
-                const originParts = originHost.split('.');
-                
-                // Take last 2 parts (domain.tld) if long enough
-                const mainDomain = hostParts.length >= 2 ? 
-                      hostParts.slice(-2).join('.') : host;
-                const originDomain = originParts.length >= 2 ? 
-                      originParts.slice(-2).join('.') : originHost;
-                
-                return mainDomain !== originDomain && host !== originHost;
-              } catch(e) {
-                // If parsing fails, err on the side of caution
-                return false;
-              }
-            }
-            """
-            return await page.evaluate(js, [element_id, self._origin])
+            return await page.evaluate(_IS_EXTERNAL_BY_ID_JS, [element_id, self._origin])
         except Exception:
-            return False
\ No newline at end of file
+            return False
@@ -3,23 +3,40 @@ from __future__ import annotations
 """Content-aware input text generator (Section 3.3.4)."""
 
 import os
+import json
+import hashlib
+from collections import OrderedDict
 from typing import Any
-import asyncio
 
 try:
     import openai
 except ImportError:  # pragma: no cover
     openai = None  # type: ignore
 
+# (placeholder keyword, reply) for the offline fallback, checked in order
+_HEURISTIC_RULES = (
+    ("email", "test@example.com"),
+    ("phone", "123-456-7890"),
+    ("name", "Jane Doe"),
+)
+
 
 class InputTextGenerator:
     """Uses an LLM (OpenAI) to synthesise realistic text for input boxes."""
 
+    CACHE_SIZE = 2048
+
     def __init__(self, openai_api_key: str | None = None, model: str = "gpt-4o-mini") -> None:
         self._model = model
+        self._client = None
         if openai:
             openai.api_key = openai_api_key or os.getenv("OPENAI_API_KEY", "")
+            if openai.api_key:
+                # one async client (and connection pool) for every request of this generator
+                self._client = openai.AsyncOpenAI(api_key=openai.api_key)
         self.token_usage: int = 0
+        # (page html digest, input box xpath or id) -> generated text, LRU ordered
+        self._cache: OrderedDict[tuple[bytes, str], str] = OrderedDict()
 
     async def generate(self, state_snapshot: Any, input_box_info: Any) -> str:
         """Generate a piece of text that fits the context of the page.
@@ -27,49 +44,54 @@ class InputTextGenerator:
         For now we fall back to simple heuristics if no OpenAI key is configured.
         """
         # Heuristic fallback --------------------------------------------------
-        if openai is None or not openai.api_key:
+        if self._client is None:
             placeholder = input_box_info.get("placeholder", "") if isinstance(input_box_info, dict) else ""
-            if "email" in placeholder.lower():
-                return "test@example.com"
-            if "phone" in placeholder.lower():
-                return "123-456-7890"
-            if "name" in placeholder.lower():
-                return "Jane Doe"
+            if placeholder:
+                pl = placeholder.lower()
+                for keyword, reply in _HEURISTIC_RULES:
+                    if keyword in pl:
+                        return reply
             return "sample text"
 
         # Build paper-style structured prompt (Fig-3) -------------------------
         html_repr = state_snapshot.get("html", "")[:1500] if isinstance(state_snapshot, dict) else ""
+        key = (
+            hashlib.blake2b(html_repr.encode("utf-8"), digest_size=8).digest(),
+            # element ids are renumbered per page load; the xpath names the same box across visits
+            str(input_box_info.get("xpath") or input_box_info.get("id", "")),
+        )
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
         prompt_template = (
             "Now suppose you are analysing a GUI page with following elements (truncated HTML below).\n"
             f"<html_snippet>\n{html_repr}\n</html_snippet>\n\n"
             f"For the input element {input_box_info.get('id', 'UNKNOWN')} please generate an example of possible input. "
             "The input you generate should be short and precise, and must follow any semantic clues in the UI (e.g. email / phone).\n\n"
-            "Please respond in the following format (JSON):\n"
-            "Input text: \"<generated input>\""
+            "Respond with a JSON object of the form {\"input_text\": \"<generated input>\"}."
         )
 
-        retries = 1
-        for attempt in range(retries):
-            try:
-                resp = await openai.ChatCompletion.acreate(
-                    model=self._model,
-                    messages=[{"role": "user", "content": prompt_template}],
-                    max_tokens=32,
-                )
-                self.token_usage += resp.usage.total_tokens if resp and resp.usage else 0
-                content = resp.choices[0].message.content.strip()
-                import re, json
-                json_str = re.sub(r"```[a-zA-Z]*", "", content).strip("` ")
-                if json_str.lower().startswith("input text"):
-                    # simple "Input text: "<value>"" pattern
-                    val = re.sub(r"^input text\s*:\s*", "", json_str, flags=re.I)
-                    val = val.strip().strip('"')
-                    return val
-                parsed = json.loads(json_str)
-                if isinstance(parsed, dict):
-                    return parsed.get("Input text", "sample text")
-            except Exception:
-                await asyncio.sleep(1)
-                continue
+        try:
+            resp = await self._client.chat.completions.create(
+                model=self._model,
+                messages=[{"role": "user", "content": prompt_template}],
+                max_tokens=32,
+                # JSON mode: the reply is guaranteed to be a parseable JSON object
+                response_format={"type": "json_object"},
+            )
+            self.token_usage += resp.usage.total_tokens if resp and resp.usage else 0
+            val = json.loads(resp.choices[0].message.content)["input_text"]
+            if isinstance(val, str):
+                return self._remember(key, val)
+        except Exception:
+            pass
         # final fallback
-        return "sample text" 
\ No newline at end of file
+        return "sample text"
+
+    def _remember(self, key: tuple[bytes, str], text: str) -> str:
+        self._cache[key] = text
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return text
@@ -8,8 +8,10 @@ LLM-Explorer paper, generalized for browser-based (Playwright) environments.
 
 from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 import uuid
+import json, base64
+from collections import deque
 import networkx as nx
 
 
@@ -30,7 +32,7 @@ class ActionType(str, Enum):
     INPUT = "input"
 
 
-@dataclass
+@dataclass(slots=True)
 class UIElement:
     """A concrete DOM element.
 
@@ -43,7 +45,7 @@ class UIElement:
     description: str
 
 
-@dataclass
+@dataclass(slots=True)
 class AbstractAction:
     """Aggregates multiple concrete actions that trigger the same behaviour."""
 
@@ -54,13 +56,17 @@ class AbstractAction:
     actual_elements: List[UIElement] = field(default_factory=list)
     exploration_flag: ExplorationFlag = ExplorationFlag.UNEXPLORED
     function_desc: str = ""  # short natural language summary
+    # True when the representative element is a link leaving the explored site
+    is_external: bool = False
+    # node ids of `actual_elements`, for O(1) containment checks
+    node_id_set: set[str] = field(default_factory=set, repr=False)
 
     # back-pointer to source / destination states set during graph insertion
     source_abs_state: "AbstractState" | None = field(default=None, repr=False)
     target_abs_state: "AbstractState" | None = field(default=None, repr=False)
 
 
-@dataclass
+@dataclass(slots=True)
 class AbstractState:
     """A cluster of visually-different but semantically-equivalent DOM trees."""
 
@@ -75,72 +81,167 @@ class AbstractState:
     # ---- NEW FIELDS (knowledge organisation prompt outputs) -------------
     page_description: str = ""  # short natural-language summary of the page
     element_groups: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    # canonical JSON (sort_keys) of every entry in `element_groups`, for de-duplication
+    element_group_keys: set[str] = field(default_factory=set, repr=False)
 
 
 class AbstractInteractionGraph:
-    """Directed Multi-DiGraph connecting abstract states via abstract actions."""
+    """Directed multigraph connecting abstract states via abstract actions.
+
+    Stored as plain adjacency dicts (`src_id -> dst_id -> action_id -> action`, plus the
+    reverse direction); `to_networkx()` builds a NetworkX view on demand.
+    """
 
     def __init__(self) -> None:
-        self._g: nx.MultiDiGraph = nx.MultiDiGraph()
+        self._states: Dict[str, AbstractState] = {}
+        self._out: Dict[str, Dict[str, Dict[str, AbstractAction]]] = {}
+        self._in: Dict[str, Dict[str, Dict[str, AbstractAction]]] = {}
+        # action_id -> every (src_id, dst_id) edge the action labels
+        self._edges_by_action: Dict[str, set[Tuple[str, str]]] = {}
+        # bumped on every structural change; lets callers memoise path queries
+        self.version: int = 0
+        # (src_id, dst_id) -> shortest action path, valid for `_path_cache_version` only
+        self._path_cache: Dict[Tuple[str, str], List[AbstractAction]] = {}
+        self._path_cache_version: int = 0
 
     # --- state helpers ----------------------------------------------------
     def add_state(self, state: AbstractState) -> None:
-        if state.state_id not in self._g:
-            self._g.add_node(state.state_id, obj=state)
+        if state.state_id not in self._states:
+            self._states[state.state_id] = state
+            self._out[state.state_id] = {}
+            self._in[state.state_id] = {}
+            self.version += 1
 
     def get_state(self, state_id: str) -> Optional[AbstractState]:
-        if state_id in self._g:
-            return self._g.nodes[state_id]["obj"]
-        return None
+        return self._states.get(state_id)
 
     # --- edge helpers -----------------------------------------------------
     def add_edge(self, src: AbstractState, action: AbstractAction, dst: AbstractState) -> None:
         self.add_state(src)
         self.add_state(dst)
-        self._g.add_edge(src.state_id, dst.state_id, key=action.action_id, obj=action)
+        out_edges = self._out[src.state_id].setdefault(dst.state_id, {})
+        # re-adding an existing edge leaves the graph (and the path memo) untouched
+        if out_edges.get(action.action_id) is not action:
+            out_edges[action.action_id] = action
+            self._in[dst.state_id].setdefault(src.state_id, {})[action.action_id] = action
+            self._edges_by_action.setdefault(action.action_id, set()).add((src.state_id, dst.state_id))
+            self.version += 1
         # Update back-pointers
         action.source_abs_state = src
         action.target_abs_state = dst
 
+    def remove_edge(self, src_id: str, dst_id: str, key: str) -> None:
+        """Remove a single edge; raises `KeyError` if it does not exist."""
+        out_edges = self._out[src_id][dst_id]
+        del out_edges[key]
+        if not out_edges:
+            del self._out[src_id][dst_id]
+        in_edges = self._in[dst_id][src_id]
+        del in_edges[key]
+        if not in_edges:
+            del self._in[dst_id][src_id]
+        edges = self._edges_by_action[key]
+        edges.discard((src_id, dst_id))
+        if not edges:
+            del self._edges_by_action[key]
+        self.version += 1
+
+    def edges_of(self, action_id: str) -> List[Tuple[str, str]]:
+        """`(src_id, dst_id)` of every edge labelled with `action_id`."""
+        return list(self._edges_by_action.get(action_id, ()))
+
+    def edges_with_data(self) -> Iterator[Tuple[str, str, str, AbstractAction]]:
+        """Yield `(src_id, dst_id, action_id, action)` for every edge."""
+        for u, targets in self._out.items():
+            for v, actions in targets.items():
+                for k, act in actions.items():
+                    yield u, v, k, act
+
+    def adjacent(self, state_id: str) -> Iterator[Tuple[str, AbstractAction]]:
+        """Yield `(neighbour_id, action)` ignoring edge direction (outgoing edges preferred)."""
+        out = self._out.get(state_id, {})
+        for v, actions in out.items():
+            yield v, next(iter(actions.values()))
+        for v, actions in self._in.get(state_id, {}).items():
+            if v not in out:
+                yield v, next(iter(actions.values()))
+
     def successors(self, state: AbstractState) -> List[Tuple[AbstractState, AbstractAction]]:
         res: List[Tuple[AbstractState, AbstractAction]] = []
-        for _, dst_id, key in self._g.out_edges(state.state_id, keys=True):
-            dst = self._g.nodes[dst_id]["obj"]
-            action = self._g.edges[state.state_id, dst_id, key]["obj"]
-            res.append((dst, action))
+        for dst_id, actions in self._out.get(state.state_id, {}).items():
+            dst = self._states[dst_id]
+            for action in actions.values():
+                res.append((dst, action))
         return res
 
     def shortest_path(self, src: AbstractState, dst: AbstractState) -> List[AbstractAction]:
-        """Return a list of AbstractActions along the shortest path."""
-        try:
-            path_nodes = nx.shortest_path(self._g, src.state_id, dst.state_id)
-            # translate node path to action path
-            actions: List[AbstractAction] = []
-            for i in range(len(path_nodes) - 1):
-                # pick *any* action along edge; MultiDiGraph could have several
-                edge_data = self._g.get_edge_data(path_nodes[i], path_nodes[i + 1])
-                if not edge_data:
-                    continue
-                # choose first key deterministically
-                first_key = list(edge_data.keys())[0]
-                actions.append(edge_data[first_key]["obj"])
-            return actions
-        except nx.NetworkXNoPath:
+        """Return a list of AbstractActions along the shortest path.
+
+        Results are memoised until the graph changes; callers get their own list.
+        """
+        if src.state_id == dst.state_id:
+            return []
+        if self._path_cache_version != self.version:
+            self._path_cache.clear()
+            self._path_cache_version = self.version
+        key = (src.state_id, dst.state_id)
+        path = self._path_cache.get(key)
+        if path is None:
+            path = self._path_cache[key] = self._shortest_path(src.state_id, dst.state_id)
+        return list(path)
+
+    def _shortest_path(self, src_id: str, dst_id: str) -> List[AbstractAction]:
+        """Breadth-first search along edge directions; [] when unreachable."""
+        if src_id not in self._out or dst_id not in self._out:
             return []
+        # state_id -> (previous state_id, action taken); first action of a multi-edge wins
+        parent: Dict[str, Tuple[str, AbstractAction]] = {}
+        visited = {src_id}
+        queue = deque([src_id])
+        while queue:
+            u = queue.popleft()
+            for v, actions in self._out[u].items():
+                if v in visited:
+                    continue
+                visited.add(v)
+                parent[v] = (u, next(iter(actions.values())))
+                if v == dst_id:
+                    return _walk_back(parent, src_id, dst_id)
+                queue.append(v)
+        return []
 
     # convenience ----------------------------------------------------------
     def to_networkx(self) -> nx.MultiDiGraph:
-        return self._g
-
-
-@dataclass
+        """Build a NetworkX copy of the graph (node/edge attribute `obj` holds the object)."""
+        g = nx.MultiDiGraph()
+        for sid, state in self._states.items():
+            g.add_node(sid, obj=state)
+        for u, v, k, act in self.edges_with_data():
+            g.add_edge(u, v, key=k, obj=act)
+        return g
+
+
+def _walk_back(
+    parent: Dict[str, Tuple[str, AbstractAction]], src_id: str, dst_id: str
+) -> List[AbstractAction]:
+    """Turn a BFS parent map into the action list leading from `src_id` to `dst_id`."""
+    actions: List[AbstractAction] = []
+    node = dst_id
+    while node != src_id:
+        node, action = parent[node]
+        actions.append(action)
+    actions.reverse()
+    return actions
+
+
+@dataclass(slots=True)
 class RawTraceItem:
     start_state: Any  # placeholder for concrete browser state snapshot
     action: Any  # placeholder for concrete action object (Playwright)
     end_state: Any
 
 
-@dataclass
+@dataclass(slots=True)
 class AppKnowledge:
     """Container that holds the entire exploration knowledge for an app."""
 
@@ -150,19 +251,36 @@ class AppKnowledge:
     aig: AbstractInteractionGraph = field(default_factory=AbstractInteractionGraph)
     # Maintain a fast index of unexplored actions for quick lookup / termination checks
     unexplored_action_ids: set[str] = field(default_factory=set, repr=False)
+    # Same index split per source state (state_id -> unexplored action ids)
+    unexplored_by_state: Dict[str, set[str]] = field(default_factory=dict, repr=False)
+    # action_id -> state_id the action was registered on
+    _action_state: Dict[str, str] = field(default_factory=dict, repr=False)
+    # repr_signature -> state_id, so signature lookups do not scan every state
+    _sig_index: Dict[str, str] = field(default_factory=dict, repr=False)
+    # action lookups by (action_type, node_id), (action_type, function) and (action_type, xpath);
+    # the first action registered under a key wins
+    elem_index: Dict[Tuple[str, str], AbstractAction] = field(default_factory=dict, repr=False)
+    func_index: Dict[Tuple[str, str], AbstractAction] = field(default_factory=dict, repr=False)
+    xpath_index: Dict[Tuple[str, str], AbstractAction] = field(default_factory=dict, repr=False)
+    # ids of the actions flagged INEFFECTIVE, whose graph edges the path finder may prune
+    ineffective_action_ids: set[str] = field(default_factory=set, repr=False)
 
     # --- CRUD helpers -----------------------------------------------------
     def get_or_create_state(self, state_signature: str) -> AbstractState:
-        # naive method using signature as hash
-        for st in self.abstract_states.values():
-            if st.repr_signature == state_signature:
-                return st
+        st = self.find_state_by_signature(state_signature)
+        if st is not None:
+            return st
         # create new
         new_state = AbstractState(repr_signature=state_signature)
         self.abstract_states[new_state.state_id] = new_state
+        self._sig_index[state_signature] = new_state.state_id
         self.aig.add_state(new_state)
         return new_state
 
+    def find_state_by_signature(self, state_signature: str) -> Optional[AbstractState]:
+        sid = self._sig_index.get(state_signature)
+        return self.abstract_states.get(sid) if sid is not None else None
+
     def add_raw_trace_item(self, start_state: Any, action: Any, end_state: Any) -> None:
         self.raw_trace.append(RawTraceItem(start_state, action, end_state))
 
@@ -170,26 +288,93 @@ class AppKnowledge:
     # fast-access helpers ------------------------------------------------
 
     def register_action(self, action: AbstractAction) -> None:
-        """Insert new action into global dict and unexplored index."""
+        """Insert new action into global dict and unexplored indices.
+
+        `action.source_abs_state` should be set beforehand so the action is also
+        indexed under its state.
+        """
         self.abstract_actions[action.action_id] = action
+        self._index_action(action)
+        if action.source_abs_state is not None:
+            self._action_state[action.action_id] = action.source_abs_state.state_id
         if action.exploration_flag == ExplorationFlag.UNEXPLORED:
-            self.unexplored_action_ids.add(action.action_id)
+            self._mark_unexplored(action.action_id)
+
+    def add_element(self, action: AbstractAction, elem: UIElement) -> None:
+        """Append `elem` to an existing action and make it findable through the indices.
+
+        Elements whose `node_id` the action already holds are ignored.
+        """
+        if elem.node_id in action.node_id_set:
+            return
+        action.actual_elements.append(elem)
+        self.index_element(action, elem)
+
+    def index_element(self, action: AbstractAction, elem: UIElement) -> None:
+        """Index one element of `action` under its node id and xpath."""
+        atype = action.action_type.value
+        action.node_id_set.add(elem.node_id)
+        self.elem_index.setdefault((atype, elem.node_id), action)
+        if elem.description:
+            self.xpath_index.setdefault((atype, elem.description), action)
+
+    def rename_element(self, action: AbstractAction, elem: UIElement, node_id: str) -> None:
+        """Give `elem` of `action` a new `node_id`, moving its index entry along.
+
+        Only registered actions are (re-)indexed; temporary ones just get the new id.
+        """
+        old_id = elem.node_id
+        elem.node_id = node_id
+        action.node_id_set.discard(old_id)
+        if action.action_id not in self.abstract_actions:
+            action.node_id_set.add(node_id)
+            return
+        old_key = (action.action_type.value, old_id)
+        if self.elem_index.get(old_key) is action:
+            del self.elem_index[old_key]
+        self.index_element(action, elem)
+
+    def _index_action(self, action: AbstractAction) -> None:
+        for elem in action.actual_elements:
+            self.index_element(action, elem)
+        func = action.function_desc.strip().lower()
+        if func:
+            self.func_index.setdefault((action.action_type.value, func), action)
 
     def update_action_flag(self, action: AbstractAction, new_flag: ExplorationFlag) -> None:
         prev_flag = action.exploration_flag
         action.exploration_flag = new_flag
         if prev_flag == ExplorationFlag.UNEXPLORED and new_flag != ExplorationFlag.UNEXPLORED:
-            self.unexplored_action_ids.discard(action.action_id)
+            self._unmark_unexplored(action.action_id)
         if prev_flag != ExplorationFlag.UNEXPLORED and new_flag == ExplorationFlag.UNEXPLORED:
-            self.unexplored_action_ids.add(action.action_id)
+            self._mark_unexplored(action.action_id)
+        if new_flag == ExplorationFlag.INEFFECTIVE:
+            self.ineffective_action_ids.add(action.action_id)
+        else:
+            self.ineffective_action_ids.discard(action.action_id)
+
+    def unexplored_in_state(self, state_id: str) -> set[str]:
+        """Ids of the unexplored actions registered on `state_id` (do not mutate)."""
+        return self.unexplored_by_state.get(state_id) or set()
+
+    def _mark_unexplored(self, action_id: str) -> None:
+        self.unexplored_action_ids.add(action_id)
+        state_id = self._action_state.get(action_id)
+        if state_id is not None:
+            self.unexplored_by_state.setdefault(state_id, set()).add(action_id)
+
+    def _unmark_unexplored(self, action_id: str) -> None:
+        self.unexplored_action_ids.discard(action_id)
+        state_id = self._action_state.get(action_id)
+        if state_id is not None and state_id in self.unexplored_by_state:
+            self.unexplored_by_state[state_id].discard(action_id)
 
     # ------------------------------------------------------------------
     # persistence -------------------------------------------------------
 
     def to_json(self) -> Dict[str, Any]:
         """Serialize knowledge into a JSON-serialisable structure."""
-        import json, base64
-        # For brevity we only store meta – raw_trace is base64-encoded json for size reasons
+        # For brevity we only store meta; raw_trace items are embedded as plain JSON
         return {
             "abstract_states": {
                 sid: {
@@ -208,20 +393,23 @@ class AppKnowledge:
                     "dst": a.target_abs_state.state_id if a.target_abs_state else None,
                     "elements": [e.node_id for e in a.actual_elements],
                     "function": a.function_desc,
+                    "external": a.is_external,
                 }
                 for aid, a in self.abstract_actions.items()
             },
             "edges": [
                 (u, v, k)
-                for u, v, k in self.aig.to_networkx().edges(keys=True)
+                for u, v, k, _ in self.aig.edges_with_data()
             ],
             "unexplored": list(self.unexplored_action_ids),
-            "raw_trace": base64.b64encode(json.dumps([rt.__dict__ for rt in self.raw_trace]).encode()).decode(),
+            "raw_trace": [
+                {"start_state": rt.start_state, "action": rt.action, "end_state": rt.end_state}
+                for rt in self.raw_trace
+            ],
         }
 
     @classmethod
     def from_json(cls, data: Dict[str, Any]) -> "AppKnowledge":
-        import json, base64
         K = cls()
         # rebuild states
         for sid, meta in data["abstract_states"].items():
@@ -231,7 +419,9 @@ class AppKnowledge:
                 page_description=meta.get("page_desc", ""),
                 element_groups=meta.get("element_groups", []),
             )
+            st.element_group_keys = {json.dumps(g, sort_keys=True) for g in st.element_groups}
             K.abstract_states[sid] = st
+            K._sig_index.setdefault(st.repr_signature, sid)
         # rebuild actions
         for aid, meta in data["abstract_actions"].items():
             a = AbstractAction(
@@ -239,9 +429,15 @@ class AppKnowledge:
                 action_type=ActionType(meta["action_type"]),
                 exploration_flag=ExplorationFlag(meta["flag"]),
                 function_desc=meta["function"],
+                is_external=meta.get("external", False),
             )
-            a.actual_elements = [UIElement(node_id=eid, description="") for eid in meta["elements"]]
+            a.actual_elements = [UIElement(node_id=eid, description="") for eid in dict.fromkeys(meta["elements"])]
             K.abstract_actions[aid] = a
+            K._index_action(a)
+            if a.exploration_flag == ExplorationFlag.INEFFECTIVE:
+                K.ineffective_action_ids.add(aid)
+            if meta.get("src"):
+                K._action_state[aid] = meta["src"]
         # link states & actions, rebuild edges
         for u, v, k in data["edges"]:
             src = K.abstract_states[u]
@@ -249,12 +445,16 @@ class AppKnowledge:
             act = K.abstract_actions[k]
             src.actions[k] = act
             K.aig.add_edge(src, act, dst)
-        # unexplored set
-        K.unexplored_action_ids = set(data.get("unexplored", []))
-        # raw trace
-        rt_bytes = base64.b64decode(data["raw_trace"])
-        rt_list = json.loads(rt_bytes.decode())
-        from dataclasses import asdict
+        # unexplored set; ids of actions missing from the dump, already explored or
+        # leading off-site would otherwise be picked (and fail) again and again
+        for aid in data.get("unexplored", []):
+            a = K.abstract_actions.get(aid)
+            if a is not None and a.exploration_flag == ExplorationFlag.UNEXPLORED and not a.is_external:
+                K._mark_unexplored(aid)
+        # raw trace (older dumps stored it as base64-encoded JSON)
+        rt_list = data["raw_trace"]
+        if isinstance(rt_list, str):
+            rt_list = json.loads(base64.b64decode(rt_list).decode())
         for item in rt_list:
             K.raw_trace.append(RawTraceItem(**item))
         return K 
\ No newline at end of file
@@ -14,6 +14,9 @@ from .knowledge import (
 from .state_matcher import StateMatcher
 from .element_grouper import ElementGrouper  # will create stub later
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class KnowledgeMaintainer:
@@ -22,6 +25,10 @@ class KnowledgeMaintainer:
     def __init__(self, state_matcher: StateMatcher | None = None) -> None:
         self._state_matcher = state_matcher or StateMatcher()
         self._grouper = ElementGrouper()
+        # snapshot handled by the previous update and the state it was assigned to; the
+        # next step passes it back as `prev_state_snapshot`
+        self._last_snapshot: Any | None = None
+        self._last_state: AbstractState | None = None
 
     # ------------------------------------------------------------------
     def update_knowledge(
@@ -41,7 +48,7 @@ class KnowledgeMaintainer:
 
         # 2. Update/merge abstract states ---------------------------------------
         new_state_sig = self._state_matcher.signature(new_state_snapshot)
-        new_abs_state: AbstractState = self._state_matcher.match_state(K, new_state_snapshot)
+        new_abs_state: AbstractState = self._state_matcher.match_state(K, new_state_snapshot, new_state_sig)
         if new_abs_state is None:
             new_abs_state = K.get_or_create_state(new_state_sig)
             new_abs_state.concrete_states.append(new_state_snapshot)
@@ -49,6 +56,9 @@ class KnowledgeMaintainer:
             if isinstance(new_state_snapshot, dict):
                 new_abs_state.page_description = new_state_snapshot.get("page_description", "")
                 new_abs_state.element_groups = new_state_snapshot.get("element_groups", [])
+                new_abs_state.element_group_keys = {
+                    json.dumps(g, sort_keys=True) for g in new_abs_state.element_groups
+                }
         else:
             # Add snapshot to cluster for future refinement
             new_abs_state.concrete_states.append(new_state_snapshot)
@@ -59,10 +69,12 @@ class KnowledgeMaintainer:
             if isinstance(new_state_snapshot, dict):
                 egroups = new_state_snapshot.get("element_groups", [])
                 if egroups:
-                    seen_str = {json.dumps(d, sort_keys=True) for d in new_abs_state.element_groups}
+                    seen_str = new_abs_state.element_group_keys
                     for g in egroups:
-                        if json.dumps(g, sort_keys=True) not in seen_str:
+                        key = json.dumps(g, sort_keys=True)
+                        if key not in seen_str:
                             new_abs_state.element_groups.append(g)
+                            seen_str.add(key)
 
         # 3. Process new actions observed in the *current* state  --------------
         #    For the web setting we rely on ElementGrouper to group similar
@@ -74,21 +86,33 @@ class KnowledgeMaintainer:
             candidate_ui_actions = self._grouper.extract_actions(new_state_snapshot)
             if isinstance(candidate_ui_actions, tuple):
                 candidate_ui_actions = candidate_ui_actions[0]
+        external_ids: set[str] = set()
+        if isinstance(new_state_snapshot, dict):
+            external_ids = set(new_state_snapshot.get("external_elements", ()))
         for concrete_action in candidate_ui_actions:
             if self._action_matches_existing(K, concrete_action):
                 continue
             abs_action = self._create_abstract_action(concrete_action)
+            abs_action.is_external = abs_action.actual_elements[0].node_id in external_ids
             abs_action.source_abs_state = new_abs_state
             K.register_action(abs_action)
             new_abs_state.actions[abs_action.action_id] = abs_action
             abs_action.exploration_flag = ExplorationFlag.UNEXPLORED
-            # Debug - log action registration
-            elements_str = ','.join([e.node_id for e in abs_action.actual_elements])
-            print(f"Registered new action: {abs_action.action_id} ({abs_action.action_type}) with {len(abs_action.actual_elements)} elements: {elements_str[:50]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Registered new action: %s (%s) with %d elements: %.50s...",
+                    abs_action.action_id,
+                    abs_action.action_type,
+                    len(abs_action.actual_elements),
+                    ",".join(e.node_id for e in abs_action.actual_elements),
+                )
 
         # 4. Update prev_action flag + graph ------------------------------------
         if prev_state_snapshot is not None and prev_action_concrete is not None:
-            prev_abs_state = self._state_matcher.match_state(K, prev_state_snapshot)
+            if prev_state_snapshot is self._last_snapshot:
+                prev_abs_state = self._last_state
+            else:
+                prev_abs_state = self._state_matcher.match_state(K, prev_state_snapshot)
             if prev_abs_state:
                 matched_abs_action = self._match_abstract_action(K, prev_action_concrete)
                 if matched_abs_action:
@@ -103,7 +127,7 @@ class KnowledgeMaintainer:
                     else:
                         # ineffective – prune edge if exists
                         try:
-                            K.aig.to_networkx().remove_edge(
+                            K.aig.remove_edge(
                                 prev_abs_state.state_id,
                                 new_abs_state.state_id,
                                 key=matched_abs_action.action_id,
@@ -111,6 +135,8 @@ class KnowledgeMaintainer:
                         except Exception:
                             pass
 
+        self._last_snapshot = new_state_snapshot
+        self._last_state = new_abs_state
         return K
 
     # ------------------------------------------------------------------
@@ -118,27 +144,30 @@ class KnowledgeMaintainer:
 
     def _action_matches_existing(self, K: AppKnowledge, concrete_action: Any) -> bool:
         """Heuristic: compare element identifier & type against existing actions."""
-        target_func = concrete_action.get("function", "").strip().lower()
+        atype = concrete_action["action_type"]
         elem_id = str(concrete_action["element_id"])
 
-        for a in K.abstract_actions.values():
-            if a.action_type.value != concrete_action["action_type"]:
-                continue
+        # 1) Exact element id match
+        if (atype, elem_id) in K.elem_index:
+            return True
 
-            # 1) Exact element id match
-            if any(elem.node_id == elem_id for elem in a.actual_elements):
-                return True
+        target_func = concrete_action.get("function") or ""
+        xpath = concrete_action.get("xpath")
 
-            # 2) Same function description (LLM grouping)
-            if target_func and a.function_desc.strip().lower() == target_func:
+        # 2) Same function description (LLM grouping)
+        if target_func:
+            a = K.func_index.get((atype, target_func.strip().lower()))
+            if a is not None:
                 # merge this concrete element into the existing abstract action
-                a.actual_elements.append(UIElement(node_id=elem_id, description=""))
+                K.add_element(a, UIElement(node_id=elem_id, description=""))
                 return True
 
-            # NEW: 1b) XPath match across dynamic ids
-            if concrete_action.get("xpath") and any(elem.description == concrete_action.get("xpath") for elem in a.actual_elements):
+        # NEW: 1b) XPath match across dynamic ids
+        if xpath:
+            a = K.xpath_index.get((atype, xpath))
+            if a is not None:
                 # Also merge the new dynamic id for completeness
-                a.actual_elements.append(UIElement(node_id=elem_id, description=concrete_action.get("xpath", "")))
+                K.add_element(a, UIElement(node_id=elem_id, description=xpath))
                 return True
         return False
 
@@ -146,19 +175,20 @@ class KnowledgeMaintainer:
         elem_id = str(concrete_action["element_id"])
         elem = UIElement(node_id=elem_id, description=concrete_action.get("xpath", ""))
         elems: list[UIElement] = [elem]
+        seen = {elem_id}
         for eid in concrete_action.get("elements", [])[1:]:  # skip first as already added
-            elems.append(UIElement(node_id=str(eid), description=""))
+            eid = str(eid)
+            if eid in seen:
+                continue
+            seen.add(eid)
+            elems.append(UIElement(node_id=eid, description=""))
         aa = AbstractAction(
             action_type=ActionType(concrete_action["action_type"]),
             actual_elements=elems,
             function_desc=concrete_action.get("function", ""),
+            node_id_set=seen,
         )
         return aa
 
     def _match_abstract_action(self, K: AppKnowledge, concrete_action: Any) -> AbstractAction | None:
-        for a in K.abstract_actions.values():
-            if a.action_type.value == concrete_action["action_type"]:
-                elem_id = str(concrete_action["element_id"])
-                if any(elem.node_id == elem_id for elem in a.actual_elements):
-                    return a
-        return None 
\ No newline at end of file
+        return K.elem_index.get((concrete_action["action_type"], str(concrete_action["element_id"])))
@@ -2,14 +2,41 @@ from __future__ import annotations
 
 """Fault-tolerant navigation path finder (Section 3.3.3)."""
 
-from typing import List
-from .knowledge import AppKnowledge, AbstractAction, AbstractState, ExplorationFlag
-import networkx as nx
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+from .knowledge import AppKnowledge, AbstractAction, AbstractState
 
 
 class PathFinder:
     def __init__(self, max_retry: int = 3) -> None:
         self.max_retry = max_retry
+        # memoised paths keyed by (query, src_id, dst_id); only valid for one AIG version
+        self._cache: Dict[Tuple[str, str, str], List[AbstractAction]] = {}
+        self._cache_key: Tuple[int, int] | None = None
+
+    def _cached(
+        self,
+        K: AppKnowledge,
+        key: Tuple[str, str, str],
+        compute: Callable[[], List[AbstractAction]],
+    ) -> List[AbstractAction]:
+        """Return a copy of the memoised path for `key`, computing it on a miss.
+
+        The cache is dropped whenever the AIG (or the knowledge object) changes, so
+        repeated queries between two graph updates are answered without a search.
+        """
+        if self._cache_key != (id(K.aig), K.aig.version):
+            self._cache.clear()
+        path = self._cache.get(key)
+        if path is None:
+            path = compute()
+            # `compute` may prune edges itself; store under the version it ended with
+            if self._cache_key != (id(K.aig), K.aig.version):
+                self._cache.clear()
+                self._cache_key = (id(K.aig), K.aig.version)
+            self._cache[key] = path
+        # callers consume the path with pop(), never hand out the cached list
+        return list(path)
 
     def find_path(
         self, K: AppKnowledge, current_state: AbstractState, target_action: AbstractAction
@@ -20,6 +47,15 @@ class PathFinder:
         target_state = target_action.source_abs_state
         if target_state is None:
             return []
+        return self._cached(
+            K,
+            ("action", current_state.state_id, target_state.state_id),
+            lambda: self._find_path(K, current_state, target_state),
+        )
+
+    def _find_path(
+        self, K: AppKnowledge, current_state: AbstractState, target_state: AbstractState
+    ) -> List[AbstractAction]:
         for attempt in range(self.max_retry):
             path = K.aig.shortest_path(current_state, target_state)
             if path:
@@ -33,33 +69,37 @@ class PathFinder:
         return []
 
     def _prune_ineffective_edges(self, K: AppKnowledge) -> None:
-        g = K.aig.to_networkx()
-        to_remove = []
-        for u, v, k, data in g.edges(keys=True, data=True):
-            act: AbstractAction = data["obj"]
-            if act.exploration_flag == ExplorationFlag.INEFFECTIVE:
-                to_remove.append((u, v, k))
-        for u, v, k in to_remove:
-            g.remove_edge(u, v, key=k)
+        for aid in K.ineffective_action_ids:
+            for u, v in K.aig.edges_of(aid):
+                K.aig.remove_edge(u, v, key=aid)
 
     # ------------------------------------------------------------------
     def _bfs_any_path(self, K: AppKnowledge, src: AbstractState, dst: AbstractState) -> List[AbstractAction]:
         """Breadth-first search over the *undirected* view of the AIG as last-chance fallback."""
-        g_undir = K.aig.to_networkx().to_undirected(as_view=True)
-        try:
-            nodes_path = nx.shortest_path(g_undir, src.state_id, dst.state_id)
-            actions: List[AbstractAction] = []
-            for i in range(len(nodes_path) - 1):
-                # choose first available action along the multi-edge set (direction disregarded)
-                multiedges = K.aig.to_networkx().get_edge_data(nodes_path[i], nodes_path[i + 1])
-                if not multiedges:
-                    multiedges = K.aig.to_networkx().get_edge_data(nodes_path[i + 1], nodes_path[i])
-                if multiedges:
-                    first_key = list(multiedges.keys())[0]
-                    actions.append(multiedges[first_key]["obj"])
-            return actions
-        except Exception:
+        src_id, dst_id = src.state_id, dst.state_id
+        if src_id == dst_id:
             return []
+        # state_id -> (previous state_id, action joining them, direction disregarded)
+        parent: Dict[str, Tuple[str, AbstractAction]] = {}
+        visited = {src_id}
+        queue = deque([src_id])
+        while queue:
+            u = queue.popleft()
+            for v, action in K.aig.adjacent(u):
+                if v in visited:
+                    continue
+                visited.add(v)
+                parent[v] = (u, action)
+                if v == dst_id:
+                    actions: List[AbstractAction] = []
+                    node = dst_id
+                    while node != src_id:
+                        node, step = parent[node]
+                        actions.append(step)
+                    actions.reverse()
+                    return actions
+                queue.append(v)
+        return []
 
     def path_to_state(
         self, K: AppKnowledge, src_state: AbstractState, dst_state: AbstractState
@@ -67,6 +107,7 @@ class PathFinder:
         """Return navigation actions from src_state to dst_state using current AIG."""
         if src_state == dst_state:
             return []
+        # memoised by the AIG itself until the graph changes
         return K.aig.shortest_path(src_state, dst_state)
 
     # Additional fault tolerance such as retries / alternative paths can be built
@@ -2,17 +2,253 @@ from __future__ import annotations
 
 """Utilities for determining if two concrete UI states are semantically equivalent."""
 
+import asyncio
+import concurrent.futures
 import hashlib
-from typing import Any, Optional
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Coroutine, Optional
+from urllib.parse import urlparse
 from .knowledge import AppKnowledge, AbstractState
 
-from dotenv import load_dotenv
-load_dotenv()
-import openai
-client = openai.OpenAI()
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover
+    tiktoken = None  # type: ignore
+
+try:
+    from pybloom_live import ScalableBloomFilter
+except ImportError:  # pragma: no cover
+    ScalableBloomFilter = None  # type: ignore
+
+# .env, openai and the OpenAI client are loaded on first use so that importing this
+# module (or never needing an LLM verdict) does not read .env or set up HTTP clients.
+_llm_enabled: bool | None = None
+_aclient = None
+# Every async LLM request runs on this one background loop (started on first use), so a
+# single AsyncOpenAI client and its connection pool serve all matches.
+_llm_loop: asyncio.AbstractEventLoop | None = None
+_llm_loop_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+# In-memory LRU cache of equivalence checks to avoid repeated LLM calls, keyed on the
+# host the screens belong to plus the sorted pair of screen signatures; backed by an
+# optional on-disk table (see `StateMatcher(equiv_db=...)`). Signatures of agent snapshots only cover the URL
+# path, so the host keeps verdicts of one site from being applied to another.
+_EQUIV_CACHE: OrderedDict[tuple[str, str, str], bool] = OrderedDict()
+_EQUIV_CACHE_SIZE = 50_000
+# Negative verdicts (the vast majority) are kept in a Bloom filter instead when
+# pybloom_live is installed. It is only consulted after the exact caches (the LRU and
+# the on-disk table), so a filter false positive can only report a pair that has no
+# stored verdict as not equivalent.
+_EQUIV_NEG = (
+    ScalableBloomFilter(initial_capacity=10_000, error_rate=1e-4) if ScalableBloomFilter is not None else None
+)
+# path -> open verdict table, or None when it could not be opened
+_equiv_dbs: dict[str, sqlite3.Connection | None] = {}
+# connections are shared between the caller's thread and the LLM loop thread
+_equiv_db_lock = threading.Lock()
+
+# Model answering the equivalence questions
+_LLM_MODEL = "gpt-4o-mini"
+# Upper bound on concurrent LLM equivalence requests issued by one match
+_LLM_CONCURRENCY = 10
+# Reference screens compared against the new screen in a single LLM request
+_LLM_BATCH_SIZE = 20
+# Returned by the batch check when the request itself failed (as opposed to NONE)
+_LLM_FAILED = -1
+# Tag-multiset Jaccard similarity (over the whole tag tree) below which two screens are
+# taken as different without asking the LLM. There is no automatic accept: pages built
+# on a shared layout score high even when they serve different functions.
+_JACCARD_REJECT = 0.6
+# Abstract states in the ambiguous band that are sent to the LLM, most similar first
+_LLM_TOP_K = 3
+# Size of the tag-path skeleton describing one screen in an LLM prompt
+_SKELETON_CHARS = 600
+
+
+def _get_llm_loop() -> asyncio.AbstractEventLoop:
+    global _llm_loop
+    with _llm_loop_lock:
+        if _llm_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="state-matcher-llm", daemon=True).start()
+            _llm_loop = loop
+    return _llm_loop
+
+
+def _submit(coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+    """Schedule `coro` on the background LLM loop.
+
+    Usable from synchronous code (block on `.result()`) and from any other event loop
+    (await `asyncio.wrap_future(...)`), e.g. from inside the exploration agent.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_llm_loop())
+
+
+def _llm_available() -> bool:
+    """Load .env and openai on first call; True if an OpenAI API key is configured."""
+    global _llm_enabled
+    if _llm_enabled is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        import openai
+        _llm_enabled = bool(openai.api_key)
+    return _llm_enabled
+
+
+def _get_aclient():
+    """AsyncOpenAI client; only used on the background LLM loop, which owns its pool."""
+    global _aclient
+    if _aclient is None:
+        import httpx
+        import openai
+        _aclient = openai.AsyncOpenAI(
+            api_key=openai.api_key or None,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=128, max_keepalive_connections=64)
+            ),
+        )
+    return _aclient
+
+
+def _get_equiv_db(path: str | None) -> sqlite3.Connection | None:
+    """Open the equivalence table at `path` on first use; None if disabled or unavailable."""
+    if path is None:
+        return None
+    with _equiv_db_lock:
+        if path not in _equiv_dbs:
+            db = None
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS verdicts"
+                    "(host TEXT, a TEXT, b TEXT, v INTEGER, PRIMARY KEY(host, a, b))"
+                )
+            except (OSError, sqlite3.Error):
+                logger.warning("Equivalence cache %s unavailable; keeping it in memory only", path)
+                db = None
+            _equiv_dbs[path] = db
+        return _equiv_dbs[path]
+
+
+def _equiv_key(host: str, pair: tuple[str, str]) -> tuple[str, str, str]:
+    a, b = pair
+    return (host, a, b) if a <= b else (host, b, a)
+
+
+def _remember_equiv(key: tuple[str, str, str], val: bool) -> None:
+    if not val and _EQUIV_NEG is not None:
+        _EQUIV_NEG.add("|".join(key))
+        return
+    _EQUIV_CACHE[key] = val
+    _EQUIV_CACHE.move_to_end(key)
+    if len(_EQUIV_CACHE) > _EQUIV_CACHE_SIZE:
+        _EQUIV_CACHE.popitem(last=False)
+
+
+def _equiv_get(db_path: str | None, host: str, pair: tuple[str, str]) -> Optional[bool]:
+    """Cached verdict for the screen signature `pair` on `host`, or None when never checked."""
+    key = _equiv_key(host, pair)
+    val = _EQUIV_CACHE.get(key)
+    if val is not None:
+        _EQUIV_CACHE.move_to_end(key)
+        return val
+    row = None
+    db = _get_equiv_db(db_path)
+    if db is not None:
+        try:
+            with _equiv_db_lock:
+                row = db.execute("SELECT v FROM verdicts WHERE host = ? AND a = ? AND b = ?", key).fetchone()
+        except sqlite3.Error:
+            pass
+    if row is None:
+        if _EQUIV_NEG is not None and "|".join(key) in _EQUIV_NEG:
+            return False
+        return None
+    val = bool(row[0])
+    _remember_equiv(key, val)
+    return val
+
+
+def _equiv_put(db_path: str | None, host: str, pair: tuple[str, str], val: bool) -> None:
+    key = _equiv_key(host, pair)
+    _remember_equiv(key, val)
+    db = _get_equiv_db(db_path)
+    if db is None:
+        return
+    try:
+        with _equiv_db_lock:
+            db.execute("INSERT OR REPLACE INTO verdicts(host, a, b, v) VALUES (?, ?, ?, ?)", (*key, int(val)))
+    except sqlite3.Error:
+        logger.debug("Could not persist equivalence verdict", exc_info=True)
+
+
+def _tag_jaccard(a: Counter[str], b: Counter[str]) -> float:
+    """Jaccard similarity of two tag multisets."""
+    union = sum((a | b).values())
+    return sum((a & b).values()) / union if union else 0.0
+
+
+@lru_cache(maxsize=None)
+def _answer_bias(answers: tuple[str, ...]) -> dict[str, int]:
+    """`logit_bias` that restricts the model's reply to the tokens of `answers`.
+
+    Empty (no restriction) when tiktoken or its encoding for the model is unavailable.
+    """
+    if tiktoken is None:
+        return {}
+    try:
+        enc = tiktoken.encoding_for_model(_LLM_MODEL)
+    except Exception:
+        return {}
+    return {str(tok): 100 for answer in answers for tok in enc.encode(answer)}
+
+
+def _sorted_json(obj: Any) -> str:
+    """Compact key-sorted JSON of `obj`; `str(obj)` if it is not serialisable.
+
+    Always the stdlib encoder: the text feeds signatures (and persisted cache keys),
+    so it must not change with which optional packages are installed.
+    """
+    try:
+        return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(obj)
+
+
+def _snapshot_host(snapshot: Any) -> str:
+    """Host of the snapshot's URL ("" when it has none)."""
+    if isinstance(snapshot, dict) and snapshot.get("url"):
+        try:
+            return urlparse(str(snapshot["url"])).netloc.lower()
+        except Exception:
+            return ""
+    return ""
+
+
+@lru_cache(maxsize=1024)
+def _split_url(url: str) -> str:
+    """Path of `url` plus its query string (kept for SPA routing); `url` itself if unparsable."""
+    try:
+        url_obj = urlparse(url)
+    except Exception:
+        return url
+    if url_obj.query:
+        return url_obj.path + "?" + url_obj.query
+    return url_obj.path
 
-# Simple in-memory cache of equivalence checks to avoid repeated LLM calls
-_EQUIV_CACHE: dict[tuple[str, str], bool] = {}
 
 class StateMatcher:
     """Default implementation uses a simple rule-based DOM skeleton hash.
@@ -22,8 +258,18 @@ class StateMatcher:
     that deliberately ignores dynamic text content.
     """
 
-    def __init__(self) -> None:
-        pass
+    SIG_CACHE_SIZE = 512
+
+    def __init__(self, equiv_db: str | os.PathLike[str] | None = None) -> None:
+        # SQLite file persisting LLM equivalence verdicts; None keeps them in memory only.
+        # Verdicts are keyed on path-level signatures, so sharing one file between
+        # unrelated runs is at the caller's own risk.
+        self._equiv_db: str | None = os.fspath(equiv_db) if equiv_db is not None else None
+        # id(snapshot) -> (snapshot, signature), LRU ordered; holding the snapshot keeps
+        # its id from being reused by another object while the entry is cached
+        self._sig_cache: OrderedDict[int, tuple[Any, str]] = OrderedDict()
+        # state_id -> [(signature, prompt excerpt, tag counts)] of the state's reference snapshots
+        self._ref_cache: dict[str, list[tuple[str, Optional[str], Counter[str]]]] = {}
 
     # ------------------------------------------------------------------
     def signature(self, state_snapshot: Any) -> str:
@@ -34,57 +280,197 @@ class StateMatcher:
         but we treat it as opaque. 
         
         Include both DOM structure AND page URL path to differentiate pages.
+
+        Snapshots produced by the exploration agent carry their signature under the
+        ``"signature"`` key (computed once when the snapshot is taken); it is returned
+        as-is instead of being recomputed on every match. Other snapshots are memoised by
+        identity, so they must not be mutated once their signature has been taken.
         """
+        if isinstance(state_snapshot, dict):
+            precomputed = state_snapshot.get("signature")
+            if precomputed:
+                return precomputed
+        key = id(state_snapshot)
+        hit = self._sig_cache.get(key)
+        if hit is not None and hit[0] is state_snapshot:
+            self._sig_cache.move_to_end(key)
+            return hit[1]
+        sig = self._compute_signature(state_snapshot)
+        self._sig_cache[key] = (state_snapshot, sig)
+        if len(self._sig_cache) > self.SIG_CACHE_SIZE:
+            self._sig_cache.popitem(last=False)
+        return sig
+
+    def _compute_signature(self, state_snapshot: Any) -> str:
         canon = self._canonicalize(state_snapshot)
         
         # Include URL path in the signature to differentiate different pages
         url = ""
         if isinstance(state_snapshot, dict) and "url" in state_snapshot:
-            url = state_snapshot["url"]
-            # Extract path component only
-            try:
-                from urllib.parse import urlparse
-                url_obj = urlparse(url)
-                url = url_obj.path
-                # Add query string for SPA routing if present
-                if url_obj.query:
-                    url += "?" + url_obj.query
-            except Exception:
-                pass
-        
+            url = _split_url(str(state_snapshot["url"]))
+
         # Final signature combines both DOM structure and URL path
-        combined = f"{canon}|{url}"
-        return hashlib.sha256(combined.encode("utf-8")).hexdigest()
+        h = hashlib.blake2b(canon.encode("utf-8"), digest_size=32)
+        h.update(b"|")
+        h.update(url.encode("utf-8"))
+        return h.hexdigest()
+
+    def match_state(
+        self, K: AppKnowledge, state_snapshot: Any, sig: Optional[str] = None
+    ) -> Optional[AbstractState]:
+        """Return the abstract state `state_snapshot` belongs to, if any.
+
+        `sig` may carry the snapshot's signature when the caller already computed it.
+        Synchronous wrapper around :meth:`amatch_state`; blocks while LLM checks run.
+        """
+        if sig is None:
+            sig = self.signature(state_snapshot)
+        # 1) quick hash match ------------------------------------------------
+        st = K.find_state_by_signature(sig)
+        if st is not None or not _llm_available():
+            return st
+        return _submit(self._amatch_llm(K, state_snapshot)).result()
 
-    def match_state(self, K: AppKnowledge, state_snapshot: Any) -> Optional[AbstractState]:
-        sig = self.signature(state_snapshot)
+    async def amatch_state(
+        self, K: AppKnowledge, state_snapshot: Any, sig: Optional[str] = None
+    ) -> Optional[AbstractState]:
+        """Async variant of :meth:`match_state`; LLM checks run concurrently."""
+        if sig is None:
+            sig = self.signature(state_snapshot)
         # 1) quick hash match ------------------------------------------------
-        for st in K.abstract_states.values():
-            if st.repr_signature == sig:
-                return st
+        st = K.find_state_by_signature(sig)
+        if st is not None or not _llm_available():
+            return st
+        return await asyncio.wrap_future(_submit(self._amatch_llm(K, state_snapshot)))
 
+    async def _amatch_llm(self, K: AppKnowledge, state_snapshot: Any) -> Optional[AbstractState]:
         # 2) cached LLM equivalence checks ---------------------------------
-        if not (openai and openai.api_key):
-            return None
-
+        snap_sig = self._safe_sig(state_snapshot)
+        host = _snapshot_host(state_snapshot)
+        snap_tags = self._tag_counter(state_snapshot)
+        pending: list[tuple[AbstractState, tuple[str, str], str]] = []
+        # state_id -> best tag similarity among the state's pending references
+        best: dict[str, float] = {}
         for st in K.abstract_states.values():
             # Compare against multiple reference snapshots to increase recall
-            refs = st.concrete_states[:3] if st.concrete_states else []
-            for ref in refs:
-                key = (self._safe_sig(ref), self._safe_sig(state_snapshot))
-                if key in _EQUIV_CACHE:
-                    if _EQUIV_CACHE[key]:
+            for ref_sig, excerpt, ref_tags in self._references(st):
+                key = (ref_sig, snap_sig)
+                cached = _equiv_get(self._equiv_db, host, key)
+                if cached is not None:
+                    if cached:
                         return st
                     continue
-                eq = self._llm_equivalent(ref, state_snapshot)
-                _EQUIV_CACHE[key] = eq
-                if eq:
+                if excerpt is None:
+                    _equiv_put(self._equiv_db, host, key, False)
+                    continue
+                # structural pre-check that rules out clearly different screens. It only
+                # applies to snapshots with a tag tree; the agent's page-metadata snapshots
+                # have none, so all of their candidates go to the LLM
+                if snap_tags and ref_tags:
+                    similarity = _tag_jaccard(snap_tags, ref_tags)
+                    if similarity < _JACCARD_REJECT:
+                        continue
+                    best[st.state_id] = max(similarity, best.get(st.state_id, 0.0))
+                pending.append((st, key, excerpt))
+        if len(best) > _LLM_TOP_K:
+            # only the most similar candidates are worth a request; references that carry
+            # no tag tree cannot be ranked and are kept
+            keep = set(heapq.nlargest(_LLM_TOP_K, best, key=best.__getitem__))
+            pending = [p for p in pending if p[0].state_id not in best or p[0].state_id in keep]
+        if not pending:
+            return None
+        snap_excerpt = self._prompt_excerpt(state_snapshot)
+
+        batches = [pending[i:i + _LLM_BATCH_SIZE] for i in range(0, len(pending), _LLM_BATCH_SIZE)]
+        client = _get_aclient()
+        sem = asyncio.Semaphore(_LLM_CONCURRENCY)
+
+        async def check(batch: list[tuple[AbstractState, tuple[str, str], str]]) -> Optional[AbstractState]:
+            async with sem:
+                idx = await self._allm_equivalent_batch(client, snap_excerpt, [ex for _, _, ex in batch])
+            if idx == _LLM_FAILED:
+                # no verdict: leave the pairs uncached so a later match asks again
+                return None
+            for i, (_, key, _) in enumerate(batch):
+                if idx is None or i == idx:
+                    _equiv_put(self._equiv_db, host, key, i == idx)
+            return batch[idx][0] if idx is not None else None
+
+        tasks = [asyncio.ensure_future(check(batch)) for batch in batches]
+        try:
+            # awaited in state order so the result does not depend on response timing
+            for task in tasks:
+                st = await task
+                if st is not None:
                     return st
-        return None
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _references(self, st: AbstractState) -> list[tuple[str, Optional[str], Counter[str]]]:
+        """(signature, prompt excerpt, tag counts) of the first three concrete snapshots of `st`.
+
+        Computed once per state; `concrete_states` only grows by appending, so the
+        entry is rebuilt only while the state has fewer than three snapshots.
+        """
+        refs = st.concrete_states[:3]
+        cached = self._ref_cache.get(st.state_id)
+        if cached is None or len(cached) != len(refs):
+            cached = self._ref_cache[st.state_id] = [
+                (
+                    self._safe_sig(ref),
+                    None if ref is None else self._prompt_excerpt(ref),
+                    self._tag_counter(ref),
+                )
+                for ref in refs
+            ]
+        return cached
+
+    @staticmethod
+    def _prompt_excerpt(snapshot: Any) -> str:
+        """Text of `snapshot` shown to the LLM.
+
+        The DOM skeleton when the snapshot has a tag tree (it leaves out the dynamic text
+        the signature ignores too), otherwise the truncated snapshot itself.
+        """
+        return StateMatcher._skeleton_prompt(snapshot) or str(snapshot)[:1200]
+
+    @staticmethod
+    def _skeleton_prompt(snapshot: Any) -> str:
+        """Tag paths of the leaf elements, e.g. ``"body>nav>ul>li body>main>form>input"``.
+
+        Consecutive repeats (list items, table rows, ...) are collapsed and the result
+        is cut at `_SKELETON_CHARS`; empty when `snapshot` has no tag tree.
+        """
+        dom = snapshot["dom_tree"] if isinstance(snapshot, dict) and "dom_tree" in snapshot else snapshot
+        parts: list[str] = []
+        size = 0
+        last = ""
+        stack: list[tuple[Any, str]] = [(dom, "")]
+        try:
+            while stack and size < _SKELETON_CHARS:
+                node, prefix = stack.pop()
+                if isinstance(node, dict):
+                    tag = node.get("tag")
+                    path = f"{prefix}>{tag}" if prefix and tag else (tag or prefix)
+                    children = node.get("children")
+                    if children:
+                        stack.extend((c, path) for c in reversed(children))
+                    elif path and path != last:
+                        parts.append(path)
+                        size += len(path) + 1
+                        last = path
+                elif isinstance(node, list):
+                    stack.extend((c, prefix) for c in reversed(node))
+        except Exception:
+            return ""
+        return " ".join(parts)[:_SKELETON_CHARS]
 
     def _safe_sig(self, snap: Any) -> str:
         try:
-            return self.signature(snap)[:16]
+            return self.signature(snap)
         except Exception:
             return str(id(snap))
 
@@ -101,46 +487,74 @@ class StateMatcher:
             self._extract_tags(dom, tags, limit=256)
             return ",".join(tags)
         except Exception:
-            return str(snapshot)[:1024]
+            return _sorted_json(snapshot)[:1024]
+
+    def _tag_counter(self, snapshot: Any) -> Counter[str]:
+        """Multiset of all tags in the tag tree of `snapshot`.
+
+        Unlike the signature it is not cut at the first 256 tags, which on most pages
+        are the shared header and navigation markup.
+        """
+        dom = snapshot["dom_tree"] if isinstance(snapshot, dict) and "dom_tree" in snapshot else snapshot
+        tags: list[str] = []
+        try:
+            self._extract_tags(dom, tags, limit=sys.maxsize)
+        except Exception:
+            pass
+        return Counter(tags)
 
     def _extract_tags(self, node: Any, acc: list[str], limit: int) -> None:
-        if len(acc) >= limit:
-            return
-        if isinstance(node, dict):
-            tag = node.get("tag", "")
-            if tag:
-                acc.append(tag)
-            children = node.get("children", [])
-            for c in children:
-                self._extract_tags(c, acc, limit)
-        elif isinstance(node, list):
-            for c in node:
-                self._extract_tags(c, acc, limit)
+        """Append tag names of `node` in document (pre-)order to `acc`, up to `limit` entries."""
+        stack = [node]
+        # bound methods and a countdown keep attribute lookups and len() out of the loop
+        pop, push, append = stack.pop, stack.extend, acc.append
+        remaining = limit - len(acc)
+        while stack and remaining > 0:
+            node = pop()
+            if isinstance(node, dict):
+                tag = node.get("tag")
+                if tag:
+                    append(tag)
+                    remaining -= 1
+                children = node.get("children")
+                if children:
+                    push(reversed(children))
+            elif isinstance(node, list):
+                push(reversed(node))
 
     # ------------------------------------------------------------------
-    def _llm_equivalent(self, snapshot_a: Any, snapshot_b: Any) -> bool:
-        """Ask an LLM whether two DOM snapshots are functionally equivalent.
+    async def _allm_equivalent_batch(self, aclient: Any, snapshot: str, refs: list[str]) -> Optional[int]:
+        """Ask an LLM which of `refs` is functionally equivalent to `snapshot`, in one request.
 
-        For efficiency we only send minimal HTML skeleton (truncated). Returns True when
-        the model answers affirmatively.
+        Screens are passed as their prompt excerpts; `aclient` is an AsyncOpenAI client.
+        Returns the index into `refs`, None when the model names no screen, or
+        `_LLM_FAILED` when the request fails.
         """
-        if snapshot_a is None:
-            return False
         try:
+            screens = "".join(
+                f"=== Screen {i} (truncated) ===\n" + ref + "\n\n" for i, ref in enumerate(refs)
+            )
             prompt = (
-                "You are comparing two web UI screens to decide if they provide the same "
-                "functionalities despite possible cosmetic/content differences. "
-                "Answer with a single token: YES or NO.\n\n"
-                "=== Screen A (truncated) ===\n" + str(snapshot_a)[:1200] + "\n\n"
-                "=== Screen B (truncated) ===\n" + str(snapshot_b)[:1200] + "\n\n"
-                "Same function?"
+                "You are comparing web UI screens to decide which of them provide the same "
+                "functionalities as the target screen despite possible cosmetic/content differences. "
+                f"Answer with a single token: the number (0-{len(refs) - 1}) of the equivalent screen, "
+                "or NONE.\n\n"
+                + screens
+                + "=== Target screen (truncated) ===\n" + snapshot + "\n\n"
+                "Equivalent screen?"
             )
-            resp = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            resp = await aclient.chat.completions.create(
+                model=_LLM_MODEL,
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=1,
+                max_tokens=2,
+                temperature=0,
+                logit_bias=_answer_bias(tuple(map(str, range(len(refs)))) + ("NONE",)),
             )
-            answer = resp.choices[0].message.content.strip().lower()
-            return answer.startswith("y")
+            answer = (resp.choices[0].message.content or "").strip().rstrip(".").upper()
         except Exception:
-            return False 
\ No newline at end of file
+            logger.warning("LLM equivalence request failed", exc_info=True)
+            return _LLM_FAILED
+        # the logit bias is empty without tiktoken, so tolerate padding and punctuation
+        if answer.isdigit() and int(answer) < len(refs):
+            return int(answer)
+        return None